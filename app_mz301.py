@@ -2,18 +2,9 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 
-from parse_data import (
-                    parse_voorlooprecord, 
-                    parse_verzekerdenrecord, 
-                    parse_prestatierecord, 
-                    parse_commentaarrecord, 
-                    parse_sluitrecord, 
-                    check_parsing
-)
-from clean_data import (
-                    merge_data,
-                    clean_data
-)
+from rules import MZ301_RULES
+from pipeline import FILE_CHECKS
+from helpers import show_checks, validate_upload
 
 def display(df):
     """
@@ -43,6 +34,10 @@ def display(df):
         if pd.api.types.is_datetime64_any_dtype(df[col]):
             # Convert the datetime to a string in the format dd-mm-YYYY
             df_display[col] = df_display[col].dt.strftime('%d-%m-%Y')
+
+    # bedragen are stored in cents, display them in euros
+    for col in ['Tarief prestatie', 'Declaratiebedrag']:
+        df_display[col] = df_display[col] / 100
     
     return df_display
 
@@ -63,439 +58,16 @@ my_upload = st.sidebar.file_uploader("")
 
 # set-up main page
 if my_upload is not None:
-    # read data
-    string_data = my_upload.getvalue().decode("ISO-8859-1")  # decode bytes to string
-    lines = string_data.splitlines()
-
-    # parse data line by line per record type
-    voorlooprecord = [parse_voorlooprecord(ln) for ln in lines if ln[0:2] == "01"]
-    verzekerdenrecord = [parse_verzekerdenrecord(ln) for ln in lines if ln[0:2] == "02"]
-    prestatierecord = [parse_prestatierecord(ln) for ln in lines if ln[0:2] == "04"]
-    commentaarrecord = [parse_commentaarrecord(ln) for ln in lines if ln[0:2] == "98"]
-    sluitrecord = [parse_sluitrecord(ln) for ln in lines if ln[0:2] == "99"]
-
-    # convert to clean dfs
-    df_voorlooprecord = pd.DataFrame(voorlooprecord)
-    df_verzekerdenrecord = pd.DataFrame(verzekerdenrecord)
-    df_prestatierecord = pd.DataFrame(prestatierecord)
-    df_commentaarrecord = pd.DataFrame(commentaarrecord)
-    df_sluitrecord = pd.DataFrame(sluitrecord)
+    # parse, clean and check the data, cached per upload content across reruns
+    df, violations = validate_upload("mz301", my_upload)
 
-    # check parsing TODO: add proper logging
-    check_parsing(df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, df_commentaarrecord, df_sluitrecord)
-
-    # clean data
-    df_merged = merge_data(df_verzekerdenrecord, df_prestatierecord)
-    df = clean_data(df_merged)
+    # counts and totals that do not match the sluitrecord
+    for melding in df.attrs.get(FILE_CHECKS, []):
+        st.warning(melding)
 
     ### DISPLAY RESULTS #############################################
+    show_checks(df, MZ301_RULES, violations, display)
 
-    ### code combinaties ############################################
-    st.write('**Code combinaties**')
-
-    # C- en T-codes mogen niet op dezelfde behandeldatum voorkomen
-    df_filter = (
-            df.groupby(["BSN", "Datum prestatie"])
-            .filter(
-                lambda group: group["Prestatiecode"].str.contains("C").any() 
-                                and group["Prestatiecode"].str.contains("T").any()))
-    df_filter = df_filter[df_filter["Prestatiecode"].str.contains("C|T")]
-    if df_filter.shape[0] > 0:
-        with st.expander("C- en T-codes mogen niet op dezelfde behandeldatum voorkomen", expanded=False, icon="🔴"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("C- en T-codes mogen niet op dezelfde behandeldatum voorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # A10- en H-codes mogen niet op dezelfde behandeldatum voorkomen
-    df_filter = (
-        df.groupby(["Patientgegevens", "Datum prestatie", "Gebitselementcode"])
-        .filter(
-            lambda group: group["Prestatiecode"].str.contains("A10").any() 
-                            and group["Prestatiecode"].str.contains("H").any()))
-    df_filter = df_filter[df_filter["Prestatiecode"].str.contains("A10|H")]
-    if df_filter.shape[0] > 0:
-        with st.expander("A10- en H-codes mogen niet op dezelfde behandeldatum en element voorkomen", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("A10- en H-codes mogen niet op dezelfde behandeldatum en element voorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # E02 en C001, C002 of C003 mogen niet op dezelfde behandeldatum voorkomen
-    df_filter = (
-    df.groupby(["BSN", "Datum prestatie"])
-      .filter(
-          lambda group: group["Prestatiecode"].eq("E02").any()
-                         and group["Prestatiecode"].isin(["C001", "C002", "C003"]).any()
-      ))
-    df_filter = df_filter[df_filter["Prestatiecode"].str.contains("E02|C001|C002|C003")]
-    if df_filter.shape[0] > 0:
-        with st.expander("E02 en C001, C002 of C003 mogen niet op dezelfde behandeldatum voorkomen", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("E02 en C001, C002 of C003 mogen niet op dezelfde behandeldatum voorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # G72 mag niet gedeclareerd worden
-    df_filter = df[df['Prestatiecode']=='G72']
-    if df_filter.shape[0] > 0:
-        with st.expander("G72 mag niet gedeclareerd worden", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("G72 mag niet gedeclareerd worden", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # J049 vereist machtigingsnummer en voorloopcode 002
-    mask_filter = (
-    (df["Prestatiecode"] == "J049")
-    &
-    (
-        df["Geboortedatum"].isna()  # no birthdate
-        # OR Machigingsnummer is invalid:
-        | df["Machtigingsnummer"].isna()            # missing
-        | (df["Machtigingsnummer"] == "")           # empty
-        | (df["Machtigingsnummer"].str.len() < 5)   # fewer than 5 chars
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("J049 vereist machtigingsnummer en voorloopcode 002", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("J049 vereist machtigingsnummer en voorloopcode 002", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # V30 mag maximaal 1 keer op dezelfde behandeldatum voorkomen
-    mask_filter = (
-    (df["Prestatiecode"] == "V30")
-    & (
-        df.groupby(["BSN", "Datum prestatie"])["Prestatiecode"]
-          .transform(lambda s: (s == "V30").sum()) > 1
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("V30 mag maximaal 1 keer op dezelfde behandeldatum voorkomen", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("V30 mag maximaal 1 keer op dezelfde behandeldatum voorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # V35 mag maximaal 1 keer op dezelfde behandeldatum en element voorkomen
-    mask_filter = (
-    (df["Prestatiecode"] == "V35")
-    & (
-        df.groupby(["BSN", "Datum prestatie", "Gebitselementcode"])["Prestatiecode"]
-          .transform(lambda s: (s == "V35").sum()) > 1
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("V35 mag maximaal 1 keer op dezelfde behandeldatum en element voorkomen", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("V35 mag maximaal 1 keer op dezelfde behandeldatum en element voorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P045 mag maximaal 1 keer op dezelfde behandeldatum en element voorkomen
-    mask_filter = (
-    (df["Prestatiecode"] == "P045")
-    & (
-        df.groupby(["BSN", "Datum prestatie", "Gebitselementcode"])["Prestatiecode"]
-          .transform(lambda s: (s == "P045").sum()) > 1
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P045 mag maximaal 1 keer op dezelfde behandeldatum en element voorkomen", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P045 mag maximaal 1 keer op dezelfde behandeldatum en elementvoorkomen", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P045 vereist vermelding van elementnummer
-    mask_filter = (
-    (df["Prestatiecode"] == "P045")
-    & (
-        df["Gebitselementcode"].isna()            # missing (NaN)
-        | (df["Gebitselementcode"] == "")         # empty string
-        | (df["Gebitselementcode"].str.len() != 2)  # length not equal to 2
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P045 vereist vermelding van elementnummer", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P045 vereist vermelding van elementnummer", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-
-    # P045 mag maximal 8x voorkomen voor oner- of boevnkaak op zelfde datum
-    mask_filter = (
-        (df["Prestatiecode"] == "P045")
-        & (
-            (df.groupby(["BSN", "Datum prestatie"])["Gebitselementcode"]
-            .transform(lambda s: (s == "Bovenkaak").sum()) > 8)
-            |
-            (df.groupby(["BSN", "Datum prestatie"])["Gebitselementcode"]
-            .transform(lambda s: (s == "Onderkaak").sum()) > 8)
-            |
-            (df.groupby(["BSN", "Datum prestatie"])["Gebitselementcode"]
-            .transform(lambda s: (s.astype(str).str[0].isin(["1", "2"])).sum()) > 8)
-            |
-            (df.groupby(["BSN", "Datum prestatie"])["Gebitselementcode"]
-            .transform(lambda s: (s.astype(str).str[0].isin(["3", "4"])).sum()) > 8)
-        )
-    )
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P045 mag maximal 8x voorkomen voor oner- of boevnkaak op zelfde datum", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P045 mag maximal 8x voorkomen voor oner- of boevnkaak op zelfde datum", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-
-    ### onder 18 jaar #########################################################
-    st.write('**Onder 18 jaar**')
-
-    # X21 voor patiënten jonger dan 18 jaar vereist machtigingsnummer
-    mask_filter = (
-        (df["Leeftijd"] < 18)
-        & (df["Prestatiecode"] == "X21")
-        & (
-            df["Machtigingsnummer"].isna()            # missing entirely
-            | (df["Machtigingsnummer"] == "")         # empty string
-            | (df["Machtigingsnummer"].str.len() < 5))) # fewer than 5 chars
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("X21 voor patiënten jonger dan 18 jaar vereist machtigingsnummer", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("X21 voor patiënten jonger dan 18 jaar vereist machtigingsnummer", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # G-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ
-    mask_filter = (
-    (df["Prestatiecode"] == "G") 
-    & (df["Leeftijd"] < 18) 
-    & (df["Verzekering"].str.contains("VGZ", na=False))
-    & (
-        df["Machtigingsnummer"].isna()               # missing 
-        | (df["Machtigingsnummer"] == "")            # empty string
-        | (df["Machtigingsnummer"].str.len() < 5)    # fewer than 5 characters
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("G-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("G-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # T-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ
-    mask_filter = (
-    (df["Prestatiecode"] == "T") 
-    & (df["Leeftijd"] < 18) 
-    & (df["Verzekering"].str.contains("VGZ", na=False))
-    & (
-        df["Machtigingsnummer"].isna()               # missing 
-        | (df["Machtigingsnummer"] == "")            # empty string
-        | (df["Machtigingsnummer"].str.len() < 5)    # fewer than 5 characters
-    ))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("T-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("T-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-
-    ### minimale techniek kosten ############################################
-    st.write('**Minimale techniek kosten**')
-
-    # R24 minimale techniekkosten van 250 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "R24") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 250))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("R24 minimale techniekkosten van 250 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("R24 minimale techniekkosten van 250 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # R34 minimale techniekkosten van 525 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "R34") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 525))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("R34 minimale techniekkosten van 525 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("R34 minimale techniekkosten van 525 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # F471A minimale techniekkosten van 400 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "F471A") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 400))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("F471A minimale techniekkosten van 400 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("F471A minimale techniekkosten van 400 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # F461A minimale techniekkosten van 400 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "F461A") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 400))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("F461A minimale techniekkosten van 400 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("F461A minimale techniekkosten van 400 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    # F813A minimale techniekkosten van 25 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "F813A") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 25))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("F813A minimale techniekkosten van 25 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("F813A minimale techniekkosten van 25 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # G69 minimale techniekkosten van 130 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "G69") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] < 130))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("G69 minimale techniekkosten van 130 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("G69 minimale techniekkosten van 130 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-
-    ### maximale techniek kosten ############################################
-    st.write('**Maximale techniek kosten**')
-
-    # P023 maximale techniekkosten van 325 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "P023") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 325))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P023 maximale techniekkosten van 325 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P023 maximale techniekkosten van 325 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P020 maximale techniekkosten van 380 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "P020") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 380))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P020 maximale techniekkosten van 380 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P020 maximale techniekkosten van 380 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P022 maximale techniekkosten van 705 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "P022") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 705))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P022 maximale techniekkosten van 705 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P022 maximale techniekkosten van 705 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P068 maximale techniekkosten van 76 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "P068") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 76))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P068 maximale techniekkosten van 76 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P068 maximale techniekkosten van 76 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # P062 maximale techniekkosten van 109 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "P062") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 109))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("P062 maximale techniekkosten van 109 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("P062 maximale techniekkosten van 109 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # J100 maximale techniekkosten van 217 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "J100") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 217))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("J100 maximale techniekkosten van 217 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("J100 maximale techniekkosten van 217 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # J101 maximale techniekkosten van 217 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "J101") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 217))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("J101 maximale techniekkosten van 217 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("J101 maximale techniekkosten van 217 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-    
-    # J104 maximale techniekkosten van 93 euro
-    mask_filter = (
-    (df["Prestatiecode"] == "J104") &
-    (df["Indicatie soort prestatierecord"] == "02") & # Techniekkosten aangegeven met "02"
-    (df["Tarief prestatie"] > 93))
-    df_filter = df[mask_filter]
-    if df_filter.shape[0] > 0:
-        with st.expander("J104 maximale techniekkosten van 93 euro", expanded=False, icon="🔴️"):
-            st.dataframe(display(df_filter))
-    else:
-        with st.expander("J104 maximale techniekkosten van 93 euro", expanded=False, icon="✅"):
-            st.dataframe(display(df_filter))
-  
 
 else:
     st.markdown("#### Welkom bij Valident!")
@@ -0,0 +1,88 @@
+import itertools
+import os
+import signal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from history import HistoryIndex
+from pipeline import validate_report
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def file_kind(path):
+    """
+    Returns the pipeline kind of a file: "excel" for excel exports, "mz301" otherwise.
+    """
+    return "excel" if path.lower().endswith(EXCEL_EXTENSIONS) else "mz301"
+
+
+def validate_file(path, kind=None, history_path=None, stream=False):
+    """
+    Runs the pipeline of the file's kind on a file, for mz301 files against the
+    HistoryIndex at history_path if given. With stream, excel exports are read chunk by chunk.
+    The path goes through the pipeline as it is, so mz301 files are memory-mapped instead of read.
+    Returns the violations report of the file.
+    """
+    kind = kind or file_kind(path)
+    if kind == "mz301" and history_path is not None:
+        with HistoryIndex(history_path) as history:
+            report = validate_report(kind, path, history=history)
+    elif kind == "excel" and stream:
+        report = validate_report(kind, path, stream=True)
+    else:
+        report = validate_report(kind, path)
+    report.insert(0, "Bestand", path)
+    return report
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("validation took too long")
+
+
+def _validate_in_worker(path, kind, timeout, history_path, stream):
+    # runs in a worker process: the alarm interrupts a file that takes longer than the timeout,
+    # so the worker is free again for the next file
+    if timeout:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return validate_file(path, kind, history_path, stream)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def validate_files(paths, kind=None, workers=None, timeout=None, max_pending=None, history_path=None, stream=False):
+    """
+    Validates files in a pool of worker processes. At most max_pending files (default twice
+    the number of workers) are handed to the pool at a time, the rest waits in `paths`.
+    Yields (path, report, error) for every file in the order of paths, where error is None
+    or the message of the exception (e.g. TimeoutError after `timeout` seconds) the file failed with.
+    With history_path, mz301 files are checked against and added to that HistoryIndex one at a
+    time in the order of paths, so every file is checked against exactly the files before it.
+    With stream, excel exports (sorted by Datum) are read chunk by chunk, which keeps the memory
+    of a worker bounded for large exports.
+    """
+    if history_path is not None:
+        # a file may only be handed out once the previous one is in the history
+        workers = max_pending = 1
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    paths = iter(paths)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque((path, pool.submit(_validate_in_worker, path, kind, timeout, history_path, stream))
+                        for path in itertools.islice(paths, max_pending))
+        while pending:
+            path, future = pending.popleft()
+            try:
+                report, error = future.result(), None
+            except Exception as e:
+                report, error = None, f"{type(e).__name__}: {e}"
+
+            # keep the pool busy while the caller handles the result
+            for next_path in itertools.islice(paths, 1):
+                pending.append((next_path, pool.submit(_validate_in_worker, next_path, kind, timeout, history_path, stream)))
+
+            yield path, report, error
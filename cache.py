@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+# pyarrow is optional: without it the on-disk cache is disabled
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Directory of the on-disk cache of cleaned frames, the cache is off when it is not set
+CACHE_DIR = os.getenv("CACHE_DIR")
+
+
+def cache_path(cache_dir, kind, key):
+    """
+    Returns the parquet file of a cleaned frame in the cache directory.
+    """
+    return os.path.join(cache_dir, f"{kind}-{key}.parquet")
+
+
+def load_frame(cache_dir, kind, key):
+    """
+    Loads a cleaned frame from the cache directory.
+    Returns None if the cache is off, the frame is not cached or the file cannot be read.
+    """
+    if cache_dir is None or pyarrow is None:
+        return None
+
+    path = cache_path(cache_dir, kind, key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        return pd.read_parquet(path)
+    except (OSError, pyarrow.ArrowException):
+        # a damaged cache file is recomputed and overwritten
+        return None
+
+
+def store_frame(df, cache_dir, kind, key):
+    """
+    Stores a cleaned frame in the cache directory, if the cache is on.
+    Columns pyarrow cannot store (e.g. mixed types in an excel column) leave the frame uncached.
+    """
+    if cache_dir is None or pyarrow is None:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, kind, key)
+
+    # write to a temporary file first, so readers never see a partly written frame
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, pyarrow.ArrowException):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
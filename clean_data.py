@@ -1,5 +1,102 @@
+import hashlib
+import io
+import os
+
+import numpy as np
 import pandas as pd
 
+from record_layouts import INSURED_INDEX
+
+UZOVI_LOOKUP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'lookup_uzovi.csv')
+
+# Loaded uzovi lookups per path: (modification time, {Uzovi-nummer: Verzekering}, content hash)
+_uzovi_lookups = {}
+
+# Kaak per FDI kwadrant (first digit of the Gebitselementcode): 1 and 2 bovenkaak, 3 and 4 onderkaak
+KAAK_PER_KWADRANT = np.array([None, "Bovenkaak", "Bovenkaak", "Onderkaak", "Onderkaak",
+                              None, None, None, None, None], dtype=object)
+
+
+def kaak(elementen):
+    """
+    Derives the upper or lower jaw from the Gebitselementcode, once per distinct code.
+    Returns a categorical with "Bovenkaak", "Onderkaak" or missing.
+    """
+    codes, uniques = pd.factorize(elementen)
+    uniques = pd.Index(uniques).astype(str)
+
+    # "Bovenkaak" and "Onderkaak" are used as element in excel exports
+    first_digit = uniques.str[0]
+    is_digit = first_digit.str.isdigit()
+    kaak_uniques = np.where(is_digit, KAAK_PER_KWADRANT[np.where(is_digit, first_digit, "0").astype(int)], None)
+    kaak_uniques = np.where(uniques.isin(["Bovenkaak", "Onderkaak"]), uniques, kaak_uniques)
+
+    # -1 (missing element) takes the appended None
+    return pd.Categorical(np.append(kaak_uniques, None)[codes], categories=["Bovenkaak", "Onderkaak"])
+
+
+def _uzovi_lookup(path):
+    # (re)loads the lookup when its modification time has changed
+    mtime = os.stat(path).st_mtime_ns
+    cached = _uzovi_lookups.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            content = f.read()
+        df_uzovi = pd.read_csv(io.BytesIO(content), dtype=str).drop_duplicates(subset='Uzovi-nummer')
+        cached = (mtime, dict(zip(df_uzovi['Uzovi-nummer'], df_uzovi['Verzekering'])),
+                  hashlib.sha256(content).hexdigest())
+        _uzovi_lookups[path] = cached
+    return cached
+
+
+def load_uzovi(path=UZOVI_LOOKUP):
+    """
+    Loads the uzovi lookup once per process and again only when the file has changed.
+    Returns a dict from Uzovi-nummer to the name of the verzekering (the first one listed).
+    """
+    return _uzovi_lookup(path)[1]
+
+
+def uzovi_version(path=UZOVI_LOOKUP):
+    """
+    Returns the sha256 hex digest of the uzovi lookup, part of the cache keys of cleaned frames
+    because they contain the Verzekering looked up in it.
+    """
+    return _uzovi_lookup(path)[2]
+
+
+def verzekering(uzovi, path=UZOVI_LOOKUP):
+    """
+    Looks up the verzekering of every Uzovi-nummer, once per distinct number.
+    Returns a categorical that is missing for unknown numbers.
+    """
+    lookup = load_uzovi(path)
+    codes, uniques = pd.factorize(uzovi)
+    name_codes, names = pd.factorize(np.array([lookup.get(u) for u in uniques], dtype=object))
+
+    # -1 (missing Uzovi-nummer) takes the appended -1 (missing verzekering)
+    return pd.Categorical.from_codes(np.append(name_codes, -1)[codes], categories=names)
+
+
+# Repeating string columns, stored as categoricals so grouping and comparing work on integer codes
+CATEGORICAL_COLUMNS = [
+    'BSN',
+    'Uzovi-nummer',
+    'Verzekering',
+    'Indicatie soort prestatierecord',
+    'Prestatiecode',
+    'Gebitselementcode',
+]
+
+
+def to_categoricals(df, columns):
+    """
+    Converts the given columns that are present in the dataframe to categoricals.
+    Returns the dataframe with the converted columns.
+    """
+    return df.astype({col: 'category' for col in columns if col in df.columns})
+
+
 def merge_data(df_verzekerdenrecord, df_prestatierecord):
     """
     Selects relevant columns and merges everything it into one dataframe.
@@ -27,16 +124,70 @@ def merge_data(df_verzekerdenrecord, df_prestatierecord):
                          'Aantal uitgevoerde prestaties',
                          'Berekend bedrag (incl. btw)',
                          'Declaratiebedrag (incl. btw)',
+                         'Referentienummer dit prestatierecord',
                         ]]
     
-    df_merged = pd.merge(df_1, 
-                         df_2, 
-                         on='Burgerservicenummer (bsn) verzekerde', 
-                         how='right'
-                        )
+    if INSURED_INDEX in df_prestatierecord.columns:
+        # the parser linked every prestatierecord to the verzekerdenrecord it follows in the file
+        take = df_prestatierecord[INSURED_INDEX].to_numpy(dtype=np.int64)
+    else:
+        take = insured_by_bsn(df_1['Burgerservicenummer (bsn) verzekerde'],
+                              df_2['Burgerservicenummer (bsn) verzekerde'])
+
+    # same columns as pd.merge(df_1, df_2, on=bsn, how='right'), BSN taken from the prestatierecords
+    df_insured = (df_1.drop(columns='Burgerservicenummer (bsn) verzekerde')
+                      .reset_index(drop=True)
+                      .reindex(take)
+                      .reset_index(drop=True)
+                      .rename(columns={'Identificatie detailrecord': 'Identificatie detailrecord_x'}))
+    df_insured.insert(1, 'Burgerservicenummer (bsn) verzekerde', df_2['Burgerservicenummer (bsn) verzekerde'].to_numpy())
+    df_prestaties = (df_2.drop(columns='Burgerservicenummer (bsn) verzekerde')
+                         .reset_index(drop=True)
+                         .rename(columns={'Identificatie detailrecord': 'Identificatie detailrecord_y'}))
+
+    df_merged = pd.concat([df_insured, df_prestaties], axis=1)
     return df_merged
 
 
+def insured_by_bsn(bsn_1, bsn_2):
+    """
+    Looks up the verzekerdenrecord of every prestatierecord by BSN, for prestatierecords
+    without the parser's INSURED_INDEX. Only the first verzekerdenrecord of a BSN is used,
+    so every prestatierecord gets exactly one.
+    Returns the row number in the verzekerdenrecords per prestatierecord, -1 if there is none.
+    """
+    codes_1, codes_2 = bsn_codes(bsn_1, bsn_2)
+    unique_bsn, first = np.unique(codes_1, return_index=True)
+    if len(first) == 0:
+        return np.full(len(codes_2), -1, dtype=np.int64)
+
+    # sorted lookup of the BSN of every prestatie
+    position = np.searchsorted(unique_bsn, codes_2)
+    found = position < len(unique_bsn)
+    found[found] = unique_bsn[position[found]] == codes_2[found]
+    return np.where(found, first[np.minimum(position, len(first) - 1)], -1)
+
+
+def bsn_codes(bsn_1, bsn_2):
+    """
+    Encodes the BSNs of two columns as int64 join keys, equal for equal BSNs.
+    Digit strings are read as base-11 numbers (a digit d counts as d + 1, so leading zeros
+    count), anything else falls back to factorizing both columns together.
+    Returns an int64 array for each column.
+    """
+    bsn = pd.concat([bsn_1, bsn_2], ignore_index=True)
+    text = bsn.to_numpy(dtype=str)
+    chars = text.view(np.uint32).reshape(len(text), text.itemsize // 4)
+
+    # shorter strings are padded with code point 0, which counts as 0
+    padding = chars == 0
+    if chars.shape[1] <= 17 and (padding | ((chars >= ord("0")) & (chars <= ord("9")))).all():
+        digits = np.where(padding, 0, chars.astype(np.int64) - ord("0") + 1)
+        codes = digits @ (11 ** np.arange(chars.shape[1] - 1, -1, -1, dtype=np.int64))
+    else:
+        codes = pd.factorize(bsn)[0].astype(np.int64)
+    return codes[:len(bsn_1)], codes[len(bsn_1):]
+
 
 def clean_data(df):
     """
@@ -53,7 +204,8 @@ def clean_data(df):
                         'Tarief prestatie (incl. btw)': 'Tarief prestatie',
                         'Aantal uitgevoerde prestaties': 'Aantal',
                         'Berekend bedrag (incl. btw)': 'Berekend bedrag',
-                        'Declaratiebedrag (incl. btw)': 'Declaratiebedrag'
+                        'Declaratiebedrag (incl. btw)': 'Declaratiebedrag',
+                        'Referentienummer dit prestatierecord': 'Referentienummer'
                     })
     
     # drop columns
@@ -61,20 +213,16 @@ def clean_data(df):
                              'Identificatie detailrecord_y'], 
                     inplace=True)
     
-    # correct types
-    df_cleaned['Geboortedatum'] = pd.to_datetime(df_cleaned['Geboortedatum'], format='%Y%m%d', errors='coerce')
-    df_cleaned['Datum prestatie'] = pd.to_datetime(df_cleaned['Datum prestatie'], format='%Y%m%d', errors='coerce')
-    df_cleaned['Aantal'] = df_cleaned['Aantal'].astype(int)
-    df_cleaned['Tarief prestatie'] = df_cleaned['Tarief prestatie'].astype(float)/100
-    df_cleaned['Berekend bedrag'] = df_cleaned['Berekend bedrag'].astype(float)/100
-    df_cleaned['Declaratiebedrag'] = df_cleaned['Declaratiebedrag'].astype(float)/100
+    # types are set by the parser: dates as datetime, bedragen as signed int64 cents
     
+    # add column: kaak of the element
+    df_cleaned["Kaak"] = kaak(df_cleaned["Gebitselementcode"])
+
     # add column: leeftijd tijdens behadeling
     df_cleaned["Leeftijd"] = (df_cleaned["Datum prestatie"] - df_cleaned["Geboortedatum"]).dt.days // 365
     
     # add verzekeraar naam
-    df_uzovi = pd.read_csv('data/lookup_uzovi.csv', dtype={"Uzovi-nummer": str})
-    df_cleaned = pd.merge(df_cleaned, df_uzovi, how='left', on='Uzovi-nummer')
+    df_cleaned["Verzekering"] = verzekering(df_cleaned["Uzovi-nummer"])
     
     # order and select columns
     df_cleaned = df_cleaned[[
@@ -89,11 +237,15 @@ def clean_data(df):
         'Indicatie soort prestatierecord',
         'Prestatiecode',
         'Gebitselementcode', 
+        'Kaak',
         'Tarief prestatie', 
         'Aantal', 
         'Berekend bedrag',
         'Declaratiebedrag', 
+        'Referentienummer',
         'Leeftijd'
     ]]
+
+    df_cleaned = to_categoricals(df_cleaned, CATEGORICAL_COLUMNS)
     
     return df_cleaned
\ No newline at end of file
@@ -1,5 +1,111 @@
+import importlib.util
+
 import pandas as pandas
 
+from clean_data import kaak, to_categoricals, CATEGORICAL_COLUMNS
+
+# Columns of the excel export that are used, with the dtype to read them as.
+# Dates (None) are left to the reader, which returns excel dates as datetimes.
+EXCEL_COLUMNS = {
+    'PatientAchterNaam': str,
+    'PatientInfo': str,
+    'GeboorteDatum': None,
+    'Datum': None,
+    'code': str,
+    'Elementen': str,
+    'Honorarium': 'float64',
+    'Techniek': 'float64',
+    'bedrag': 'float64',
+}
+
+# Rows per chunk when streaming an excel export with iter_excel
+EXCEL_CHUNK_SIZE = 50_000
+
+# calamine (python-calamine) reads xlsx files much faster than openpyxl, use it when installed
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+
+
+def read_excel(source):
+    """
+    Reads only the used columns of an excel export, with explicit dtypes.
+    Returns a dataframe with the columns of EXCEL_COLUMNS.
+    """
+    return pandas.read_excel(source,
+                             engine=EXCEL_ENGINE,
+                             usecols=list(EXCEL_COLUMNS),
+                             dtype={col: dtype for col, dtype in EXCEL_COLUMNS.items() if dtype is not None})
+
+
+def iter_excel(source, chunk_size=EXCEL_CHUNK_SIZE):
+    """
+    Streams the used columns of an excel export with openpyxl in read-only mode,
+    so only one chunk of rows is in memory at a time.
+    Yields dataframes of at most chunk_size rows, indexed by row number like read_excel.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from excel_chunks(workbook.active.iter_rows(values_only=True), chunk_size)
+    finally:
+        workbook.close()
+
+
+def excel_chunks(rows, chunk_size=EXCEL_CHUNK_SIZE):
+    """
+    Projects rows of cell values (the header row first) on the columns of EXCEL_COLUMNS.
+    Yields dataframes of at most chunk_size rows, indexed by row number like read_excel.
+    """
+    rows = iter(rows)
+    header = next(rows, ())
+    missing = [col for col in EXCEL_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"Excel export is missing the columns {missing}.")
+    positions = [header.index(col) for col in EXCEL_COLUMNS]
+
+    start = 0
+    chunk = []
+    for row in rows:
+        chunk.append([row[i] if i < len(row) else None for i in positions])
+        if len(chunk) == chunk_size:
+            yield excel_chunk(chunk, start)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield excel_chunk(chunk, start)
+
+
+def excel_text(value):
+    """
+    Formats a cell value as read_excel(dtype=str) does: whole numbers without ".0".
+    Returns the text, or None for an empty cell.
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def excel_chunk(rows, start):
+    """
+    Turns projected excel rows into a dataframe with the dtypes of EXCEL_COLUMNS.
+    Returns the dataframe, indexed from `start`.
+    """
+    # object columns keep the cell values as they are, so a chunk with only numbers
+    # in a text column gives the same text as a chunk that also holds strings
+    df = pandas.DataFrame(rows, columns=list(EXCEL_COLUMNS), index=range(start, start + len(rows)), dtype=object)
+    for col, dtype in EXCEL_COLUMNS.items():
+        if dtype is None:
+            df[col] = pandas.to_datetime(df[col])
+        elif dtype is str:
+            text = df[col].map(excel_text)
+            df[col] = text.astype(str).where(text.notna())
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
 def clean_data(df):
 
     # # select relevant columns
@@ -22,15 +128,7 @@ def clean_data(df):
 
 
     # select relevant columns
-    df = df[['PatientAchterNaam',
-         'PatientInfo',
-         'GeboorteDatum', 
-         'Datum', 
-         'code', 
-         'Elementen', 
-         'Honorarium',
-         'Techniek',
-         'bedrag']]
+    df = df[list(EXCEL_COLUMNS)]
 
     # rename columns to match with mz301 as much as possible
     df = df.rename(columns={'GeboorteDatum': 'Geboortedatum',
@@ -42,7 +140,17 @@ def clean_data(df):
                             'PatientAchterNaam': 'Achternaam'
                             })
 
+    # store bedragen as int64 cents, like the mz301 data
+    for col in ['Honorarium', 'Techniek', 'Totaal Bedrag']:
+        df[col] = (df[col].fillna(0) * 100).round().astype('int64')
+
+    # create Kaak column
+    df['Kaak'] = kaak(df['Gebitselementcode'])
+
     # create Leeftijd columns
     df['Leeftijd'] = (df["Datum prestatie"] - df["Geboortedatum"]).dt.days // 365
 
+    # Patientgegevens is the patient key of the excel export, like BSN in mz301
+    df = to_categoricals(df, CATEGORICAL_COLUMNS + ['Patientgegevens'])
+
     return df
\ No newline at end of file
@@ -1,6 +1,14 @@
 import streamlit as st
 import os
 
+from incremental import IncrementalValidator
+from clean_data import uzovi_version
+from pipeline import PIPELINES, PATIENT_KEYS, RULES, content_hash
+from rules import RULESET_VERSION
+
+# number of checked uploads kept in memory, the least recently used is evicted first
+CACHE_ENTRIES = 8
+
 def require_password():
     # Als al geauthenticeerd in deze sessie, ga door
     if st.session_state.get("auth_ok"):
@@ -35,4 +43,41 @@ def require_password():
             else:
                 st.error("Je code is onjuist of verlopen. Vraag een nieuwe code aan via support@doodler.app.")
 
-    st.stop()
\ No newline at end of file
+    st.stop()
+
+
+def show_checks(df, rules, violations, display):
+    """
+    Shows one expander per rule with the violating rows, grouped by section.
+    """
+    rows_per_rule = {rule_id: rows for rule_id, rows in violations.groupby("rule_id")["row"]}
+
+    section = None
+    for rule in rules:
+        if rule.section != section:
+            section = rule.section
+            st.write(f'**{section}**')
+
+        df_filter = df.loc[rows_per_rule.get(rule.rule_id, [])]
+        icon = "🔴" if df_filter.shape[0] > 0 else "✅"
+        with st.expander(rule.title, expanded=False, icon=icon):
+            st.dataframe(display(df_filter))
+
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner="Declaraties worden gecontroleerd...")
+def _validate_cached(kind, upload_hash, ruleset_version, lookup_version, _data, _validator):
+    # the cache key is (kind, upload_hash, ruleset_version, lookup_version),
+    # _data and _validator are not hashed by streamlit
+    return PIPELINES[kind](_data, validator=_validator)
+
+
+def validate_upload(kind, upload):
+    """
+    Runs the pipeline of the given kind on an uploaded file, reusing the result of earlier reruns
+    as long as the upload content, the rule set and the uzovi lookup are the same. A corrected version of the
+    previous upload of the session only re-evaluates the patient-days that changed.
+    Returns the cleaned dataframe and its violations.
+    """
+    validator = st.session_state.setdefault(f"{kind}_validator", IncrementalValidator(RULES[kind], PATIENT_KEYS[kind]))
+    # the upload is hashed and parsed in place, without a copy of its content
+    return _validate_cached(kind, content_hash(upload), RULESET_VERSION, uzovi_version(), upload, validator)
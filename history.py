@@ -0,0 +1,114 @@
+import sqlite3
+
+import pandas as pd
+
+# Prestaties of earlier mz301 files, one row per prestatierecord. Files are only ever added,
+# once per content hash (source), so validating a file twice does not count its prestaties twice.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS prestaties (
+    bsn TEXT NOT NULL,
+    element TEXT,
+    code TEXT NOT NULL,
+    datum TEXT NOT NULL,
+    referentie TEXT,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prestaties_lookup ON prestaties (bsn, code, element, datum);
+"""
+
+# Columns of prestaties in the names of the cleaned mz301 frame
+COLUMNS = {
+    "bsn": "BSN",
+    "element": "Gebitselementcode",
+    "code": "Prestatiecode",
+    "datum": "Datum prestatie",
+    "referentie": "Referentienummer",
+}
+
+
+def referenties(column):
+    """
+    Returns the Referentienummers of a column as a list of strings, None for missing or blank ones,
+    so a blank Referentienummer never matches the blank one of another file.
+    """
+    text = column.astype(object).where(column.notna(), None)
+    return [None if r is None or not str(r).strip() else str(r) for r in text]
+
+
+class HistoryIndex:
+    """
+    Local sqlite index of the prestaties of all validated mz301 files, so rules can look back
+    at earlier declaration periods without reading the old files again.
+    """
+
+    def __init__(self, path):
+        # several batch workers may add files at the same time, sqlite serializes the writes
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, source, df):
+        """
+        Adds the prestaties of a cleaned mz301 frame under its source (content hash).
+        Returns False if the source was added before, True otherwise.
+        """
+        rows = df[list(COLUMNS.values())].dropna(subset=["BSN", "Prestatiecode", "Datum prestatie"])
+        records = zip(rows["BSN"].astype(str),
+                      rows["Gebitselementcode"].astype(object).where(rows["Gebitselementcode"].notna(), None),
+                      rows["Prestatiecode"].astype(str),
+                      rows["Datum prestatie"].dt.strftime("%Y-%m-%d"),
+                      referenties(rows["Referentienummer"]),
+                      [source] * len(rows))
+
+        with self.connection:
+            inserted = self.connection.execute("INSERT OR IGNORE INTO sources (source) VALUES (?)", (source,)).rowcount
+            if not inserted:
+                return False
+            self.connection.executemany(
+                "INSERT INTO prestaties (bsn, element, code, datum, referentie, source) VALUES (?, ?, ?, ?, ?, ?)",
+                records)
+        return True
+
+    def prestaties(self, patients, codes, exclude_referenties=(), exclude_source=None):
+        """
+        Looks up the earlier prestaties with one of the codes for the given patients (BSN).
+        Prestaties with a Referentienummer in exclude_referenties (those of the file being
+        validated, e.g. when a corrected version is uploaded again) are left out; blank ones exclude nothing.
+        The prestaties added under exclude_source are left out too, so a file validated again
+        is not counted against its own earlier copy.
+        Returns a dataframe with the BSN, Gebitselementcode, Prestatiecode and Datum prestatie.
+        """
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_bsn (bsn TEXT PRIMARY KEY)")
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_referentie (referentie TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM lookup_bsn")
+            self.connection.execute("DELETE FROM lookup_referentie")
+            self.connection.executemany("INSERT OR IGNORE INTO lookup_bsn VALUES (?)", ((str(p),) for p in patients))
+            self.connection.executemany("INSERT OR IGNORE INTO lookup_referentie VALUES (?)",
+                                        ((r,) for r in referenties(pd.Series(exclude_referenties, dtype=object))
+                                         if r is not None))
+
+            placeholders = ", ".join("?" * len(codes))
+            df = pd.read_sql_query(
+                f"""SELECT p.bsn, p.element, p.code, p.datum FROM prestaties p
+                    JOIN lookup_bsn USING (bsn)
+                    WHERE p.code IN ({placeholders})
+                      AND p.source IS NOT ?
+                      AND (p.referentie IS NULL OR p.referentie = '' OR p.referentie NOT IN (SELECT referentie FROM lookup_referentie))""",
+                self.connection, params=[*codes, exclude_source])
+
+        df = df.rename(columns={"bsn": "BSN", "element": "Gebitselementcode",
+                                "code": "Prestatiecode", "datum": "Datum prestatie"})
+        df["Datum prestatie"] = pd.to_datetime(df["Datum prestatie"])
+        return df
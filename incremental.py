@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from rules import PATIENT, evaluate_rules
+
+
+def fingerprints(df):
+    """
+    Hashes the content of every row (for mz301 including its Referentienummer).
+    Returns a uint64 array, equal rows of two versions of a file get the same fingerprint.
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class IncrementalValidator:
+    """
+    Remembers the violations of the last validated frame per row fingerprint, so a corrected
+    version of the same file only re-evaluates the patient-days whose rows changed.
+    Every rule groups per patient-day or finer, so a patient-day with exactly the same rows
+    as before has exactly the same violations.
+    """
+
+    def __init__(self, rules, patient_key):
+        self.rules = rules
+        self.patient_key = patient_key
+        self.reevaluated_rows = 0
+
+        # (sum of fingerprints, number of rows) per patient-day hash
+        self._days = {}
+        # fingerprint and rule_id of every violation, one per fingerprint and rule
+        self._violations = pd.DataFrame({"fingerprint": np.array([], dtype=np.uint64), "rule_id": []})
+
+    def day_hashes(self, df):
+        """
+        Returns the hash of the patient-day of every row.
+        """
+        keys = [self.patient_key if key == PATIENT else key for key in (PATIENT, "Datum prestatie")]
+        return pd.util.hash_pandas_object(df[keys], index=False).to_numpy()
+
+    def evaluate(self, df):
+        """
+        Evaluates the rules like evaluate_rules, reusing the violations of unchanged patient-days.
+        Returns the violations dataframe and remembers this frame for the next call.
+        """
+        fingerprint = fingerprints(df)
+        day = self.day_hashes(df)
+
+        # group the rows per patient-day, with an order-independent signature of its rows
+        order = np.argsort(day, kind="stable")
+        sorted_day = day[order]
+        starts = np.flatnonzero(np.r_[True, sorted_day[1:] != sorted_day[:-1]]) if len(df) else np.array([], dtype=np.int64)
+        counts = np.diff(np.r_[starts, len(df)])
+        sums = np.add.reduceat(fingerprint[order], starts) if len(df) else np.array([], dtype=np.uint64)
+        days = dict(zip(sorted_day[starts].tolist(), zip(sums.tolist(), counts.tolist())))
+
+        unchanged_day = np.array([self._days.get(d) == signature for d, signature in days.items()], dtype=bool)
+        unchanged = np.empty(len(df), dtype=bool)
+        unchanged[order] = np.repeat(unchanged_day, counts)
+
+        # re-evaluate the changed patient-days only
+        changed = evaluate_rules(df[~unchanged], self.rules, self.patient_key)
+        changed_positions = df.index.get_indexer(changed["row"])
+        self.reevaluated_rows = int((~unchanged).sum())
+
+        # take the violations of the unchanged rows over by fingerprint
+        unchanged_positions = np.flatnonzero(unchanged)
+        reused = pd.merge(pd.DataFrame({"fingerprint": fingerprint[unchanged_positions], "position": unchanged_positions}),
+                          self._violations, on="fingerprint")
+
+        # order like evaluate_rules: per rule in rule order, rows in frame order
+        violations = pd.DataFrame({
+            "rule_id": np.concatenate([changed["rule_id"].to_numpy(dtype=object), reused["rule_id"].to_numpy(dtype=object)]),
+            "position": np.concatenate([changed_positions, reused["position"].to_numpy(dtype=np.int64)]),
+        })
+        rule_order = pd.Categorical(violations["rule_id"], categories=[rule.rule_id for rule in self.rules]).codes
+        violations = violations.iloc[np.lexsort((violations["position"].to_numpy(), rule_order))]
+
+        self._days = days
+        self._violations = pd.DataFrame({
+            "fingerprint": fingerprint[violations["position"].to_numpy()],
+            "rule_id": violations["rule_id"].to_numpy(),
+        }).drop_duplicates()
+
+        return pd.DataFrame({"rule_id": violations["rule_id"].to_numpy(),
+                             "row": df.index[violations["position"].to_numpy()]})
@@ -1,212 +1,391 @@
+import io
+import mmap
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from collections import Counter, defaultdict
 
-def parse_voorlooprecord(line):
+from record_layouts import (
+                    RECORD_LENGTH,
+                    RECORD_KINDS,
+                    DEBET_CREDIT,
+                    INSURED_INDEX,
+                    record_layout,
+                    standard_version,
+                    parse_record
+)
+
+def parse_voorlooprecord(line, version=None):
     """
     Parse the given line into its respective fields according to fixed positions.
     Returns a dictionary with the parsed values. For record type 01, "Voorlooprecord"
     """
-    
-    # Make sure the line is at least 310 chars
-    if len(line) < 310:
-        raise ValueError("Line must be at least 310 characters long.")
-    
-    parsed = {
-        "Kenmerk record": line[0:2].strip(),
-        "Code externe-integratiebericht": line[2:5].strip(),
-        "Versienummer berichtstandaard": line[5:7].strip(),
-        "Subversienummer berichtstandaard": line[7:9].strip(),
-        "Soort bericht": line[9:10].strip(),
-        "Code informatiesysteem softwareleverancier": line[10:16].strip(),
-        "Versieaanduiding informatiesysteem softwareleverancier": line[16:26].strip(),
-        "Uzovi-nummer": line[26:30].strip(),
-        "Code servicebureau": line[30:38].strip(),
-        "Zorgverlenerscode": line[38:46].strip(),
-        "Praktijkcode": line[46:54].strip(),
-        "Instellingscode": line[54:62].strip(),
-        "Identificatiecode betaling aan": line[62:64].strip(),
-        "Begindatum declaratieperiode": line[64:72].strip(),
-        "Einddatum declaratieperiode": line[72:80].strip(),
-        "Factuurnummer declarant": line[80:92].strip(),
-        "Dagtekening factuur": line[92:100].strip(),
-        "Btw-identificatienummer": line[100:114].strip(),
-        "Valutacode": line[114:117].strip(),
-        "Reserve": line[117:310].strip(),
-    }
-    
-    return parsed
+    return parse_record(line, "01", version)
 
 
-def parse_verzekerdenrecord(line):
+def parse_verzekerdenrecord(line, version=None):
     """
     Parse the given line into its respective fields according to fixed positions.
     Returns a dictionary with the parsed values. For record type 02, "Verzekerdenrecord"
     """
+    return parse_record(line, "02", version)
 
-    # Make sure the line is at least 310 chars
-    if len(line) < 310:
-        raise ValueError("Line must be at least 310 characters long.")
 
-    parsed = {
-        "Kenmerk record": line[0:2].strip(),
-        "Identificatie detailrecord": line[2:14].strip(),
-        "Burgerservicenummer (bsn) verzekerde": line[14:23].strip(),
-        "Uzovi-nummer": line[23:27].strip(),
-        "Verzekerdennummer (inschrijvingsnummer, relatienummer)": line[27:42].strip(),
-        "Patient(identificatie)nummer": line[42:53].strip(),
-        "Datum geboorte verzekerde": line[53:61].strip(),
-        "Code geslacht verzekerde": line[61:62].strip(),
-        "Naamcode enof naamgebruik (01)": line[62:63].strip(),
-        "Naam verzekerde (01)": line[63:88].strip(),
-        "Voorvoegsel verzekerde (01)": line[88:98].strip(),
-        "Naamcode enof naamgebruik (02)": line[98:99].strip(),
-        "Naam verzekerde (02)": line[99:124].strip(),
-        "Voorvoegsel verzekerde (02)": line[124:134].strip(),
-        "Voorletters verzekerde": line[134:140].strip(),
-        "Naamcode enof naamgebruik (03)": line[140:141].strip(),
-        "Postcode (huisadres) verzekerde": line[141:147].strip(),
-        "Postcode buitenland": line[147:156].strip(),
-        "Huisnummer (huisadres) verzekerde": line[156:161].strip(),
-        "Huisnummertoevoeging (huisadres) verzekerde": line[161:167].strip(),
-        "Code land verzekerde": line[167:169].strip(),
-        "Debiteurnummer": line[169:180].strip(),
-        "Indicatie client overleden": line[180:181].strip(),
-        "Reserve": line[181:310].strip(),
-    }
-
-    return parsed
-
-def parse_prestatierecord(line):
+def parse_prestatierecord(line, version=None):
     """
     Parse the given line into its respective fields according to fixed positions.
     Returns a dictionary with the parsed values. For record type 04, "Prestatierecord"
     """
+    return parse_record(line, "04", version)
 
-    # Make sure the line is at least 310 chars
-    if len(line) < 310:
-        raise ValueError("Line must be at least 310 characters long.")
 
-    parsed = {
-        "Kenmerk record": line[0:2].strip(),
-        "Identificatie detailrecord": line[2:14].strip(),
-        "Burgerservicenummer (bsn) verzekerde": line[14:23].strip(),
-        "Uzovi-nummer": line[23:27].strip(),
-        "Verzekerdenummer (inschrijvingsnummer, relatienummer)": line[27:42].strip(),
-        "Machtigingsnummer": line[42:57].strip(),
-        "Doorsturen toegestaan": line[57:58].strip(),
-        "Datum prestatie": line[58:66].strip(),
-        "Indicatie soort prestatierecord": line[66:68].strip(),
-        "Indicatie bijzondere tandheelkunde": line[68:69].strip(),
-        "Soort bijzondere tandheelkunde": line[69:72].strip(),
-        "Aanduiding prestatiecodelijst": line[72:75].strip(),
-        "Prestatiecode": line[75:81].strip(),
-        "Indicatie boven enof onder tandheelkunde": line[81:82].strip(),
-        "Gebitselementcode": line[82:84].strip(),
-        "Vlakcode": line[84:90].strip(),
-        "Aanduiding diagnosecodelijst": line[90:93].strip(),
-        "Diagnosecode bijzondere tandheelkunde": line[93:97].strip(),
-        "Indicatie ongeval (ongevalsgevolg)": line[97:98].strip(),
-        "Zorgverlenerscode behandelaar/uitvoerder": line[98:106].strip(),
-        "Specialisme behandelaar/uitvoerder": line[106:110].strip(),
-        "Zorgverlenerscode voorschrijver/verwijzer": line[110:118].strip(),
-        "Specialisme voorschrijver/verwijzer": line[118:122].strip(),
-        "Tarief prestatie (incl. btw)": line[122:130].strip(),
-        "Aantal uitgevoerde prestaties": line[130:134].strip(),
-        "Berekend bedrag (incl. btw)": line[134:142].strip(),
-        "Indicatie debet/credit (01)": line[142:143].strip(),
-        "Bedrag vermindering bijzondere tandheelkunde": line[143:151].strip(),
-        "Btw-percentage declaratiebedrag": line[151:155].strip(),
-        "Declaratiebedrag (incl. btw)": line[155:163].strip(),
-        "Indicatie debet/credit (02)": line[163:164].strip(),
-        "Referentienummer dit prestatierecord": line[164:184].strip(),
-        "Referentienummer voorgaande gerelateerde prestatierecord": line[184:204].strip(),
-        "Reserve": line[204:310].strip(),
-    }
-
-    return parsed
-
-
-def parse_commentaarrecord(line):
+def parse_commentaarrecord(line, version=None):
     """
     Parse the given line into its respective fields according to fixed positions.
     Returns a dictionary with the parsed values. For record type 98, "Commentaarrecord"
     """
-    
-    # Make sure the line is at least 310 chars
-    if len(line) < 310:
-        raise ValueError("Line must be at least 310 characters long.")
-    
-    parsed = {
-        "Kenmerk record": line[0:2].strip(),
-        "Identificatie detailrecord": line[2:14].strip(),
-        "Regelnummer vrije tekst": line[14:18].strip(),
-        "Vrije tekst": line[18:158].strip(),
-        "Reserve": line[158:310].strip(),
-    }
-    
-    return parsed
+    return parse_record(line, "98", version)
 
 
-def parse_sluitrecord(line):
+def parse_sluitrecord(line, version=None):
     """
     Parse the given line into its respective fields according to fixed positions.
     Returns a dictionary with the parsed values. For record type 99, "Sluitrecord"
     """
-    
-    # Make sure the line is at least 310 chars
-    if len(line) < 310:
+    return parse_record(line, "99", version)
+
+
+def char_matrix(lines):
+    """
+    Lay out the lines as fixed-width rows of unicode code points.
+    Returns a (lines x 310) uint32 array, shorter lines are padded with zeros.
+    """
+    buffer = np.array(lines, dtype=f"U{RECORD_LENGTH}")
+    return buffer.view(np.uint32).reshape(len(lines), RECORD_LENGTH)
+
+
+def map_matrix(buffer):
+    """
+    Lay out a memory-mapped MZ301 file as fixed-width rows of bytes, without copying.
+    Returns a (lines x 310) uint8 view, or None if the lines are not all equally long.
+    """
+    newlines = np.flatnonzero(buffer[:2 * RECORD_LENGTH] == ord("\n"))
+    if len(newlines) == 0:
+        return None
+
+    width = newlines[0] + 1
+    n_lines = len(buffer) // width
+    rows = buffer[:n_lines * width].reshape(n_lines, width)
+
+    # every row must end with the same line ending and nothing may follow the last one
+    content = width - 1 - (width > 1 and rows[0, width - 2] == ord("\r"))
+    if (content < RECORD_LENGTH
+            or (rows[:, content:] != rows[0, content:]).any()
+            or buffer[n_lines * width:].any()):
+        return None
+
+    return rows[:, :RECORD_LENGTH]
+
+
+def field_text(chars, start, end, rows=slice(None)):
+    """
+    Slice one field out of the given rows of a char_matrix or map_matrix.
+    Returns the field as a fixed-width unicode array.
+    """
+    # ISO-8859-1 bytes are equal to their unicode code points
+    block = np.ascontiguousarray(chars[rows, start:end], dtype=np.uint32)
+    return block.view(f"U{end - start}").ravel()
+
+
+def route_records(chars):
+    """
+    Partition all lines by record kind (first two characters) in a single pass.
+    Returns a dict with the row numbers per record kind, unknown kinds included.
+    """
+    kinds = field_text(chars, 0, 2)
+
+    # one stable sort groups the rows per kind while keeping file order within a kind
+    order = np.argsort(kinds, kind="stable")
+    uniques, starts = np.unique(kinds[order], return_index=True)
+
+    return dict(zip(uniques.tolist(), np.split(order, starts[1:])))
+
+
+def field_digits(chars, start, end, rows=slice(None)):
+    """
+    Reads one zero-padded numeric field of the given rows without creating strings.
+    Returns the values as int64 and a mask of the rows that only contain digits after any
+    leading spaces, which count as zeros.
+    """
+    digits = np.ascontiguousarray(chars[rows, start:end], dtype=np.int64)
+    digits[np.logical_and.accumulate(digits == ord(" "), axis=1)] = ord("0")
+    digits -= ord("0")
+
+    numeric = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    values = np.where(numeric[:, None], digits, 0) @ (10 ** np.arange(end - start - 1, -1, -1, dtype=np.int64))
+    return values, numeric
+
+
+def field_date(chars, start, end, rows=slice(None)):
+    """
+    Reads one YYYYMMDD date field of the given rows.
+    Returns a datetime64[D] array, empty or invalid dates become NaT.
+    """
+    values, numeric = field_digits(chars, start, end, rows)
+    year, month, day = values // 10000, values // 100 % 100, values % 100
+
+    first_day = ((year - 1970) * 12 + month - 1).astype("datetime64[M]").astype("datetime64[D]")
+    month_days = (first_day.astype("datetime64[M]") + 1).astype("datetime64[D]") - first_day
+    valid = numeric & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days.astype(np.int64))
+
+    return np.where(valid, first_day + (day - 1), np.datetime64("NaT", "D"))
+
+
+def extract_columns(chars, fields, rows=slice(None)):
+    """
+    Slice every field of one record type as a typed column, from all or the given rows.
+    Text becomes str, codes categorical, bedragen int64 (cents), other numbers int32
+    and dates datetime64.
+    Returns a dataframe with the same columns as the matching parse_* function.
+    """
+
+    # Make sure every line is at least 310 chars
+    if (chars[rows, RECORD_LENGTH - 1] == 0).any():
         raise ValueError("Line must be at least 310 characters long.")
-    
-    parsed = {
-        "Kenmerk record": line[0:2].strip(),
-        "Aantal verzekerdenrecords": line[2:8].strip(),
-        "Aantal debiteurrecords": line[8:14].strip(),
-        "Aantal prestatierecords": line[14:20].strip(),
-        "Aantal commentaarrecords": line[20:26].strip(),
-        "Totaal aantal detailrecords": line[26:33].strip(),
-        "Totaal declaratiebedrag": line[33:44].strip(),
-        "Indicatie debet enof credit": line[44:45].strip(),
-        "Reserve": line[45:310].strip(),
-    }
-    
-    return parsed
 
+    columns = {}
+    for name, start, end, kind, scale in fields:
+        if kind == "int":
+            values, numeric = field_digits(chars, start, end, rows)
+            if not numeric.all():
+                raise ValueError(f"{name} must be numeric.")
+            columns[name] = values if scale else values.astype(np.int32)
+        elif kind == "date":
+            columns[name] = field_date(chars, start, end, rows)
+        elif kind == "code":
+            columns[name] = pd.Categorical(np.char.strip(field_text(chars, start, end, rows)))
+        else:
+            columns[name] = np.char.strip(field_text(chars, start, end, rows))
 
-def convert_date(date_string):
-    date_object = datetime.strptime(date_string, '%Y%m%d').date()
-    return date_object
+    return pd.DataFrame(columns)
 
 
-def check_parsing(df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, df_commentaarrecord, df_sluitrecord):
-    
-    ### Print start and end date
-    print(f"Begindatum declaratieperiode: {convert_date(df_voorlooprecord['Begindatum declaratieperiode'][0]).strftime('%d-%m-%Y')}")
-    print(f"Einddatum declaratieperiode: {convert_date(df_voorlooprecord['Einddatum declaratieperiode'][0]).strftime('%d-%m-%Y')}")
-    print(f"-------------------------------")
-    
+def parse_columns(lines, kind, version=None):
+    """
+    Parse all lines of one record type at once, slicing every field as a column.
+    Returns a dataframe with the same columns as the matching parse_* function.
+    """
+    return extract_columns(char_matrix(lines), record_layout(kind, version))
+
+
+def apply_debet_credit(df, kind):
+    """
+    Makes the credit bedragen of a record kind negative, in place.
+    Returns the dataframe with signed cents.
+    """
+    for amount, indicator in DEBET_CREDIT.get(kind, {}).items():
+        credit = (df[indicator] == "C").to_numpy()
+        df[amount] = np.where(credit, -df[amount].to_numpy(), df[amount].to_numpy())
+    return df
+
+
+def parse_block(chars, version=None, insured_offset=0):
+    """
+    Parse a block of MZ301 lines laid out by char_matrix or map_matrix.
+    insured_offset is the number of verzekerdenrecords in earlier blocks of the same file.
+    Returns the dataframes per record kind, the line counts of unknown record kinds
+    and the berichtstandaard version (read from the voorlooprecord when not given).
+    """
+    rows = route_records(chars)
+
+    # pick the layouts of the berichtstandaard version in the voorlooprecord
+    if version is None and "01" in rows:
+        header = rows["01"][:1]
+        version = standard_version(field_text(chars, 5, 7, header)[0], field_text(chars, 7, 9, header)[0])
+
+    frames = {kind: apply_debet_credit(extract_columns(chars, record_layout(kind, version), rows[kind]), kind)
+              for kind in RECORD_KINDS if kind in rows}
+    unknown = {kind: len(kind_rows) for kind, kind_rows in rows.items()
+               if kind.strip() and kind not in RECORD_KINDS}
+
+    # running count of the verzekerdenrecords so far gives every prestatierecord its verzekerdenrecord
+    if "04" in frames:
+        insured = np.zeros(len(chars), dtype=np.int64)
+        insured[rows.get("02", [])] = 1
+        frames["04"][INSURED_INDEX] = (np.cumsum(insured) - 1 + insured_offset)[rows["04"]]
+
+    return frames, unknown, version
+
+
+def collect_frames(frames, unknown=None, version=None):
+    """
+    Completes the parsed dataframes with empty ones for record kinds that did not occur.
+    Returns the voorloop-, verzekerden-, prestatie-, commentaar- and sluitrecord dataframes
+    and the line counts of the record kinds that are not parsed, e.g. "03" debiteurrecords.
+    """
+    empty = np.zeros((0, RECORD_LENGTH), dtype=np.uint32)
+    frames = {kind: frames[kind] if kind in frames else extract_columns(empty, record_layout(kind, version))
+              for kind in RECORD_KINDS}
+    if INSURED_INDEX not in frames["04"]:
+        frames["04"][INSURED_INDEX] = np.zeros(0, dtype=np.int64)
+    return (*(frames[kind] for kind in RECORD_KINDS), dict(unknown or {}))
+
+
+def parse_mz301(string_data):
+    """
+    Parse a complete decoded MZ301 file column by column.
+    Returns the voorloop-, verzekerden-, prestatie-, commentaar- and sluitrecord dataframes
+    and the line counts of the record kinds that are not parsed.
+    """
+    frames, unknown, version = parse_block(char_matrix(string_data.splitlines()))
+    return collect_frames(frames, unknown, version)
+
+
+def iter_mz301(source, chunk_size=1 << 22):
+    """
+    Reads an MZ301 file incrementally from a path or binary file-like object.
+    Decodes and parses `chunk_size` characters at a time, so only one chunk of
+    lines is in memory at once.
+    Yields (kenmerk record, dataframe) batches in file order per record kind and
+    returns the line counts of the record kinds that are not parsed.
+    """
+    binary = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    text = io.TextIOWrapper(binary, encoding="ISO-8859-1", newline=None)
+
+    try:
+        version = None
+        unknown = Counter()
+        insured_offset = 0
+        pending = ""
+        while True:
+            block = text.read(chunk_size)
+
+            # keep the last, possibly incomplete, line for the next chunk
+            lines = (pending + block).split("\n")
+            pending = lines.pop() if block else ""
+            lines = [ln for ln in lines if ln]
+            if lines:
+                frames, block_unknown, version = parse_block(char_matrix(lines), version, insured_offset)
+                unknown.update(block_unknown)
+                insured_offset += len(frames["02"]) if "02" in frames else 0
+                yield from frames.items()
+
+            if not block:
+                break
+
+        return unknown
+    finally:
+        # leave file-like objects open for the caller, close files we opened
+        text.detach()
+        if binary is not source:
+            binary.close()
+
+
+def map_mz301(path, chunk_size=1 << 22):
+    """
+    Parse an MZ301 file on disk by memory-mapping it and slicing the fixed-width
+    records straight from the mapped bytes, without decoding or splitting lines.
+    Falls back to chunked reading when the lines are not all equally long.
+    Returns the voorloop-, verzekerden-, prestatie-, commentaar- and sluitrecord dataframes
+    and the line counts of the record kinds that are not parsed.
+    """
+    if os.path.getsize(path) == 0:
+        return collect_frames({})
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        buffer = np.frombuffer(mapped, dtype=np.uint8)
+        chars = map_matrix(buffer)
+        frames = None
+        if chars is not None:
+            frames, unknown, version = parse_block(chars)
+
+        # release the views on the mapping before it is closed
+        del buffer, chars
+
+    if frames is None:
+        return read_batches(iter_mz301(path, chunk_size))
+
+    return collect_frames(frames, unknown, version)
+
+
+def read_batches(batches):
+    """
+    Concatenates the (kenmerk record, dataframe) batches of iter_mz301.
+    Returns the voorloop-, verzekerden-, prestatie-, commentaar- and sluitrecord dataframes
+    and the line counts of the record kinds that are not parsed.
+    """
+    dfs = defaultdict(list)
+    batches = iter(batches)
+    while True:
+        try:
+            kind, df = next(batches)
+        except StopIteration as done:
+            # iter_mz301 returns the unknown record kinds once exhausted
+            unknown = done.value
+            break
+        dfs[kind].append(df)
+
+    frames = {}
+    for kind, kind_dfs in dfs.items():
+        df = pd.concat(kind_dfs, ignore_index=True)
+
+        # batches have their own categories, concat falls back to plain values then
+        for col in kind_dfs[0].select_dtypes("category").columns:
+            df[col] = df[col].astype("category")
+        frames[kind] = df
+
+    return collect_frames(frames, unknown)
+
+
+def read_mz301(source, chunk_size=1 << 22):
+    """
+    Parse an MZ301 file from a path or binary file-like object.
+    Paths are memory-mapped, file-like objects are read chunk by chunk.
+    Returns the voorloop-, verzekerden-, prestatie-, commentaar- and sluitrecord dataframes
+    and the line counts of the record kinds that are not parsed.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return map_mz301(source, chunk_size)
+    return read_batches(iter_mz301(source, chunk_size))
+
+
+def check_parsing(df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, df_commentaarrecord, df_sluitrecord,
+                  unknown_records=None):
+    """
+    Compares the record counts and the total in the sluitrecord with the parsed records.
+    Returns a message for every mismatch and for every record kind that is not parsed.
+    """
+    if df_voorlooprecord.empty or df_sluitrecord.empty:
+        raise ValueError("File has no voorlooprecord (01) or sluitrecord (99), it is not an MZ301 file.")
+
+    meldingen = []
+
     ### Check if files are aligned
     # Aantal verzekerdenrecords
     verzekerdend = df_sluitrecord['Aantal verzekerdenrecords'].astype(int).iloc[0]
-    if verzekerdend == df_verzekerdenrecord.shape[0]:
-        print(f"Aantal verzekerdenrecords is {verzekerdend}")
-    else:
-        print(f"Aantal verzekerdenrecords is {df_verzekerdenrecord.shape[0]}, zou volgens sluitrecords {verzekerdend} moeten zijn.")
+    if verzekerdend != df_verzekerdenrecord.shape[0]:
+        meldingen.append(f"Aantal verzekerdenrecords is {df_verzekerdenrecord.shape[0]}, zou volgens sluitrecords {verzekerdend} moeten zijn.")
     
-    # Aantal debiteurrecords Is dit "03"?
-  
+    # Aantal debiteurrecords, "03" records are counted but not parsed
+    unknown_records = dict(unknown_records or {})
+    debiteuren = df_sluitrecord['Aantal debiteurrecords'].astype(int).iloc[0]
+    debiteuren_counted = unknown_records.pop("03", 0)
+    if debiteuren != debiteuren_counted:
+        meldingen.append(f"Aantal debiteurrecords is {debiteuren_counted}, zou volgens sluitrecords {debiteuren} moeten zijn.")
+
+    # Onbekende kenmerken
+    for kind, count in sorted(unknown_records.items()):
+        meldingen.append(f"Kenmerk record {kind} wordt niet verwerkt ({count} regels)")
+
     # Aantal prestatierecords
     prestaties = df_sluitrecord['Aantal prestatierecords'].astype(int).iloc[0]
-    if prestaties == df_prestatierecord.shape[0]:
-        print(f"Aantal prestatierecords is {prestaties}")
-    else:
-        print(f"Aantal prestatierecords is {df_prestatierecord.shape[0]}, zou volgens sluitrecords {prestaties} moeten zijn.")
+    if prestaties != df_prestatierecord.shape[0]:
+        meldingen.append(f"Aantal prestatierecords is {df_prestatierecord.shape[0]}, zou volgens sluitrecords {prestaties} moeten zijn.")
     
     # Aantal commentaarrecords
     commentaren = df_sluitrecord['Aantal commentaarrecords'].astype(int).iloc[0]
-    if commentaren == df_commentaarrecord.shape[0]:
-        print(f"Aantal commentaarrecords is {commentaren}")
-    else:
-        print(f"Commentaarrecords is {df_commentaarrecord.shape[0]}, zou volgens sluitrecords {commentaren} moeten zijn.")
+    if commentaren != df_commentaarrecord.shape[0]:
+        meldingen.append(f"Commentaarrecords is {df_commentaarrecord.shape[0]}, zou volgens sluitrecords {commentaren} moeten zijn.")
     
     # Totaal declaratierecords
     totaal = df_sluitrecord['Totaal aantal detailrecords'].astype(int).iloc[0]
@@ -217,10 +396,13 @@ def check_parsing(df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, d
                df_sluitrecord.shape[0]
                - 2 # don't count voorlop- & sluitrecord
                )
-    if totaal == totaal_summed:
-        print(f"Totaal aantal detailrecords is {totaal}")
-    else:
-        print(f"Totaal aantal detailrecords is {totaal_summed}, zou volgens sluitrecords {totaal} moeten zijn")
-    
-    
+    if totaal != totaal_summed:
+        meldingen.append(f"Totaal aantal detailrecords is {totaal_summed}, zou volgens sluitrecords {totaal} moeten zijn")
+
+    # Totaal declaratiebedrag, exact in cents
+    bedrag = df_sluitrecord['Totaal declaratiebedrag'].iloc[0]
+    bedrag_summed = df_prestatierecord['Declaratiebedrag (incl. btw)'].sum()
+    if bedrag != bedrag_summed:
+        meldingen.append(f"Totaal declaratiebedrag is {bedrag_summed / 100:.2f}, zou volgens sluitrecords {bedrag / 100:.2f} moeten zijn")
 
+    return meldingen
@@ -0,0 +1,235 @@
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+from parse_data import (
+                    read_mz301,
+                    check_parsing
+)
+from clean_data import (
+                    merge_data,
+                    clean_data,
+                    uzovi_version
+)
+import clean_data_excel
+from cache import (
+                    CACHE_DIR,
+                    load_frame,
+                    store_frame
+)
+from rules import (
+                    evaluate_rules,
+                    evaluate_rules_chunked,
+                    MZ301_RULES,
+                    EXCEL_RULES,
+                    HISTORY_RULES
+)
+
+# Key of the messages of the checks on the file as a whole (e.g. the sluitrecord totals) in the attrs of a cleaned frame
+FILE_CHECKS = "Bestandscontroles"
+
+# Files on disk are hashed in blocks of this many bytes
+HASH_BLOCK_SIZE = 1 << 20
+
+# Version of parsing and cleaning, part of the key of cached frames: increase it when the cleaned frame changes
+PARSER_VERSION = 4
+
+
+def content_hash(data):
+    """
+    Returns the sha256 hex digest of the file content (bytes, an in-memory upload or a path), used as cache key.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        # stream files on disk through the hash instead of reading them at once
+        digest = hashlib.sha256()
+        with open(data, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    if isinstance(data, io.BytesIO):
+        # hash the upload in place instead of copying it with getvalue
+        with data.getbuffer() as buffer:
+            return hashlib.sha256(buffer).hexdigest()
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_source(data):
+    """
+    Returns the file content in a form the readers take: a path as it is, so mz301 files
+    on disk are memory-mapped, otherwise a binary file-like object positioned at the start.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        return data
+    if isinstance(data, io.BytesIO):
+        data.seek(0)
+        return data
+    return io.BytesIO(data)
+
+
+def clean_mz301(data):
+    """
+    Parses and cleans the content of an mz301 file, given as bytes, an in-memory upload or a path.
+    Returns the cleaned dataframe, with the mismatches of the sluitrecord in its attrs[FILE_CHECKS].
+    """
+    (df_voorlooprecord,
+     df_verzekerdenrecord,
+     df_prestatierecord,
+     df_commentaarrecord,
+     df_sluitrecord,
+     unknown_records) = read_mz301(content_source(data))
+
+    meldingen = check_parsing(df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, df_commentaarrecord,
+                              df_sluitrecord, unknown_records)
+
+    df = clean_data(merge_data(df_verzekerdenrecord, df_prestatierecord))
+    df.attrs[FILE_CHECKS] = meldingen
+    return df
+
+
+def clean_excel(data):
+    """
+    Reads and cleans the content of an excel export, given as bytes, an in-memory upload or a path.
+    Returns the cleaned dataframe.
+    """
+    return clean_data_excel.clean_data(clean_data_excel.read_excel(content_source(data)))
+
+
+# cleaning per kind of input file
+CLEANERS = {
+    "mz301": clean_mz301,
+    "excel": clean_excel,
+}
+
+
+def cleaned_frame(kind, data, cache_dir=CACHE_DIR):
+    """
+    Cleans the file content with the cleaner of its kind, or loads the cleaned frame
+    from the on-disk cache when the same content was cleaned by the same parser version
+    with the same uzovi lookup.
+    Returns the cleaned dataframe.
+    """
+    key = f"{content_hash(data)}-v{PARSER_VERSION}-{uzovi_version()[:16]}"
+    df = load_frame(cache_dir, kind, key)
+    checks = load_frame(cache_dir, f"{kind}-checks", key)
+    if df is None or checks is None:
+        df = CLEANERS[kind](data)
+        store_frame(df, cache_dir, kind, key)
+        # the messages of the file checks are cached next to the frame, attrs are not stored reliably
+        store_frame(pd.DataFrame({FILE_CHECKS: df.attrs.get(FILE_CHECKS, [])}, dtype=object), cache_dir, f"{kind}-checks", key)
+    else:
+        df.attrs[FILE_CHECKS] = checks[FILE_CHECKS].tolist()
+    return df
+
+
+def validate_mz301(data, cache_dir=CACHE_DIR, validator=None, history=None):
+    """
+    Parses, cleans and checks the content of an mz301 file. With an IncrementalValidator
+    only the patient-days that changed since its previous file are evaluated again.
+    With a HistoryIndex the HISTORY_RULES are checked too, against the prestaties of
+    earlier files, and the prestaties of this file are added to the history.
+    Returns the cleaned dataframe and its violations.
+    """
+    df = cleaned_frame("mz301", data, cache_dir)
+    if history is not None:
+        source = content_hash(data)
+        violations = evaluate_rules(df, MZ301_RULES + HISTORY_RULES, patient_key="BSN", history=history, source=source)
+        history.add(source, df)
+        return df, violations
+    if validator is not None:
+        return df, validator.evaluate(df)
+    violations = evaluate_rules(df, MZ301_RULES, patient_key="BSN")
+    return df, violations
+
+
+def validate_excel(data, cache_dir=CACHE_DIR, validator=None, stream=False):
+    """
+    Cleans and checks the content of an excel export, incrementally with a validator like validate_mz301.
+    With stream the export is read chunk by chunk instead, see validate_excel_streaming.
+    Returns the cleaned dataframe (only the violating rows when streamed) and its violations.
+    """
+    if stream:
+        return validate_excel_streaming(content_source(data))
+    df = cleaned_frame("excel", data, cache_dir)
+    if validator is not None:
+        return df, validator.evaluate(df)
+    violations = evaluate_rules(df, EXCEL_RULES, patient_key="Patientgegevens")
+    return df, violations
+
+
+def validate_excel_streaming(source, chunk_size=clean_data_excel.EXCEL_CHUNK_SIZE):
+    """
+    Checks an excel export chunk by chunk, for exports too large to read at once.
+    The export must be sorted by Datum; only the violating rows are kept.
+    Returns the violating rows and their violations, in the order of evaluate_rules.
+    """
+    chunks = (clean_data_excel.clean_data(chunk) for chunk in clean_data_excel.iter_excel(source, chunk_size))
+
+    parts, part_violations = [], []
+    for df, violations in evaluate_rules_chunked(chunks, EXCEL_RULES, patient_key="Patientgegevens"):
+        parts.append(df.loc[violations["row"].unique()])
+        part_violations.append(violations)
+
+    if not parts:
+        df = clean_data_excel.clean_data(clean_data_excel.excel_chunk([], 0))
+        return df, evaluate_rules(df, EXCEL_RULES, patient_key="Patientgegevens")
+
+    # violations per rule in rule order, rows within a rule in file order
+    violations = pd.concat(part_violations, ignore_index=True)
+    rule_order = pd.Categorical(violations["rule_id"], categories=[rule.rule_id for rule in EXCEL_RULES])
+    violations = violations.iloc[rule_order.argsort(kind="stable")].reset_index(drop=True)
+    return pd.concat(parts), violations
+
+
+# pipeline per kind of input file
+PIPELINES = {
+    "mz301": validate_mz301,
+    "excel": validate_excel,
+}
+
+# rule set and patient column per kind of input file
+RULES = {
+    "mz301": MZ301_RULES,
+    "excel": EXCEL_RULES,
+}
+PATIENT_KEYS = {
+    "mz301": "BSN",
+    "excel": "Patientgegevens",
+}
+
+# columns of the violating rows that are included in a violations report
+REPORT_COLUMNS = ["Datum prestatie", "Prestatiecode", "Gebitselementcode"]
+
+
+def violations_report(kind, df, violations):
+    """
+    Describes every violation with its check and the row it was found in, after the
+    messages of the checks on the file as a whole (FILE_CHECKS), which have no row.
+    Returns a dataframe with one line per violation or message.
+    """
+    rules = {rule.rule_id: rule for rule in RULES[kind] + HISTORY_RULES}
+    rows = df.loc[violations["row"]]
+
+    report = pd.DataFrame({
+        "Sectie": [rules[rule_id].section for rule_id in violations["rule_id"]],
+        "Controle": [rules[rule_id].title for rule_id in violations["rule_id"]],
+        "Regel": violations["row"].to_numpy(),
+        "Patient": rows[PATIENT_KEYS[kind]].astype(object).to_numpy(),
+        **{col: rows[col].astype(object).to_numpy() for col in REPORT_COLUMNS},
+    })
+
+    meldingen = df.attrs.get(FILE_CHECKS, [])
+    if not meldingen:
+        return report
+    checks = pd.DataFrame({"Sectie": FILE_CHECKS, "Controle": meldingen}, columns=report.columns, dtype=object)
+    return pd.concat([checks, report], ignore_index=True)
+
+
+def validate_report(kind, data, **options):
+    """
+    Runs the pipeline of the given kind on file content, with options like history for mz301.
+    Returns the violations report, which is much smaller than the cleaned dataframe.
+    """
+    df, violations = PIPELINES[kind](data, **options)
+    return violations_report(kind, df, violations)
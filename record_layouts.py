@@ -0,0 +1,202 @@
+from functools import lru_cache
+from operator import itemgetter
+
+RECORD_LENGTH = 310
+
+# Record kinds that are parsed, in the order parse_mz301 returns the dataframes
+RECORD_KINDS = ("01", "02", "04", "98", "99")
+
+# Field types:
+#   "str"  free text, stripped
+#   "code" short code from a fixed list (indicaties, kenmerken)
+#   "int"  zero-padded number, with `scale` implied decimals (bedragen have scale 2)
+#   "date" date formatted as YYYYMMDD
+#
+# Every field is (name, start, end, type, scale), positions are 0-based and end-exclusive.
+
+VOORLOOPRECORD = [
+    ("Kenmerk record", 0, 2, "code", 0),
+    ("Code externe-integratiebericht", 2, 5, "code", 0),
+    ("Versienummer berichtstandaard", 5, 7, "code", 0),
+    ("Subversienummer berichtstandaard", 7, 9, "code", 0),
+    ("Soort bericht", 9, 10, "code", 0),
+    ("Code informatiesysteem softwareleverancier", 10, 16, "str", 0),
+    ("Versieaanduiding informatiesysteem softwareleverancier", 16, 26, "str", 0),
+    ("Uzovi-nummer", 26, 30, "str", 0),
+    ("Code servicebureau", 30, 38, "str", 0),
+    ("Zorgverlenerscode", 38, 46, "str", 0),
+    ("Praktijkcode", 46, 54, "str", 0),
+    ("Instellingscode", 54, 62, "str", 0),
+    ("Identificatiecode betaling aan", 62, 64, "code", 0),
+    ("Begindatum declaratieperiode", 64, 72, "date", 0),
+    ("Einddatum declaratieperiode", 72, 80, "date", 0),
+    ("Factuurnummer declarant", 80, 92, "str", 0),
+    ("Dagtekening factuur", 92, 100, "date", 0),
+    ("Btw-identificatienummer", 100, 114, "str", 0),
+    ("Valutacode", 114, 117, "code", 0),
+    ("Reserve", 117, 310, "str", 0),
+]
+
+VERZEKERDENRECORD = [
+    ("Kenmerk record", 0, 2, "code", 0),
+    ("Identificatie detailrecord", 2, 14, "str", 0),
+    ("Burgerservicenummer (bsn) verzekerde", 14, 23, "str", 0),
+    ("Uzovi-nummer", 23, 27, "str", 0),
+    ("Verzekerdennummer (inschrijvingsnummer, relatienummer)", 27, 42, "str", 0),
+    ("Patient(identificatie)nummer", 42, 53, "str", 0),
+    ("Datum geboorte verzekerde", 53, 61, "date", 0),
+    ("Code geslacht verzekerde", 61, 62, "code", 0),
+    ("Naamcode enof naamgebruik (01)", 62, 63, "code", 0),
+    ("Naam verzekerde (01)", 63, 88, "str", 0),
+    ("Voorvoegsel verzekerde (01)", 88, 98, "str", 0),
+    ("Naamcode enof naamgebruik (02)", 98, 99, "code", 0),
+    ("Naam verzekerde (02)", 99, 124, "str", 0),
+    ("Voorvoegsel verzekerde (02)", 124, 134, "str", 0),
+    ("Voorletters verzekerde", 134, 140, "str", 0),
+    ("Naamcode enof naamgebruik (03)", 140, 141, "code", 0),
+    ("Postcode (huisadres) verzekerde", 141, 147, "str", 0),
+    ("Postcode buitenland", 147, 156, "str", 0),
+    ("Huisnummer (huisadres) verzekerde", 156, 161, "str", 0),
+    ("Huisnummertoevoeging (huisadres) verzekerde", 161, 167, "str", 0),
+    ("Code land verzekerde", 167, 169, "code", 0),
+    ("Debiteurnummer", 169, 180, "str", 0),
+    ("Indicatie client overleden", 180, 181, "code", 0),
+    ("Reserve", 181, 310, "str", 0),
+]
+
+PRESTATIERECORD = [
+    ("Kenmerk record", 0, 2, "code", 0),
+    ("Identificatie detailrecord", 2, 14, "str", 0),
+    ("Burgerservicenummer (bsn) verzekerde", 14, 23, "str", 0),
+    ("Uzovi-nummer", 23, 27, "str", 0),
+    ("Verzekerdenummer (inschrijvingsnummer, relatienummer)", 27, 42, "str", 0),
+    ("Machtigingsnummer", 42, 57, "str", 0),
+    ("Doorsturen toegestaan", 57, 58, "code", 0),
+    ("Datum prestatie", 58, 66, "date", 0),
+    ("Indicatie soort prestatierecord", 66, 68, "code", 0),
+    ("Indicatie bijzondere tandheelkunde", 68, 69, "code", 0),
+    ("Soort bijzondere tandheelkunde", 69, 72, "code", 0),
+    ("Aanduiding prestatiecodelijst", 72, 75, "code", 0),
+    ("Prestatiecode", 75, 81, "str", 0),
+    ("Indicatie boven enof onder tandheelkunde", 81, 82, "code", 0),
+    ("Gebitselementcode", 82, 84, "str", 0),
+    ("Vlakcode", 84, 90, "str", 0),
+    ("Aanduiding diagnosecodelijst", 90, 93, "code", 0),
+    ("Diagnosecode bijzondere tandheelkunde", 93, 97, "str", 0),
+    ("Indicatie ongeval (ongevalsgevolg)", 97, 98, "code", 0),
+    ("Zorgverlenerscode behandelaar/uitvoerder", 98, 106, "str", 0),
+    ("Specialisme behandelaar/uitvoerder", 106, 110, "code", 0),
+    ("Zorgverlenerscode voorschrijver/verwijzer", 110, 118, "str", 0),
+    ("Specialisme voorschrijver/verwijzer", 118, 122, "code", 0),
+    ("Tarief prestatie (incl. btw)", 122, 130, "int", 2),
+    ("Aantal uitgevoerde prestaties", 130, 134, "int", 0),
+    ("Berekend bedrag (incl. btw)", 134, 142, "int", 2),
+    ("Indicatie debet/credit (01)", 142, 143, "code", 0),
+    ("Bedrag vermindering bijzondere tandheelkunde", 143, 151, "int", 2),
+    ("Btw-percentage declaratiebedrag", 151, 155, "int", 2),
+    ("Declaratiebedrag (incl. btw)", 155, 163, "int", 2),
+    ("Indicatie debet/credit (02)", 163, 164, "code", 0),
+    ("Referentienummer dit prestatierecord", 164, 184, "str", 0),
+    ("Referentienummer voorgaande gerelateerde prestatierecord", 184, 204, "str", 0),
+    ("Reserve", 204, 310, "str", 0),
+]
+
+COMMENTAARRECORD = [
+    ("Kenmerk record", 0, 2, "code", 0),
+    ("Identificatie detailrecord", 2, 14, "str", 0),
+    ("Regelnummer vrije tekst", 14, 18, "int", 0),
+    ("Vrije tekst", 18, 158, "str", 0),
+    ("Reserve", 158, 310, "str", 0),
+]
+
+SLUITRECORD = [
+    ("Kenmerk record", 0, 2, "code", 0),
+    ("Aantal verzekerdenrecords", 2, 8, "int", 0),
+    ("Aantal debiteurrecords", 8, 14, "int", 0),
+    ("Aantal prestatierecords", 14, 20, "int", 0),
+    ("Aantal commentaarrecords", 20, 26, "int", 0),
+    ("Totaal aantal detailrecords", 26, 33, "int", 0),
+    ("Totaal declaratiebedrag", 33, 44, "int", 2),
+    ("Indicatie debet enof credit", 44, 45, "code", 0),
+    ("Reserve", 45, 310, "str", 0),
+]
+
+# Bedragen that are negative when their Indicatie debet/credit is "C" (credit)
+DEBET_CREDIT = {
+    "04": {
+        "Berekend bedrag (incl. btw)": "Indicatie debet/credit (01)",
+        "Declaratiebedrag (incl. btw)": "Indicatie debet/credit (02)",
+    },
+    "99": {
+        "Totaal declaratiebedrag": "Indicatie debet enof credit",
+    },
+}
+
+# Column the parser adds to the prestatierecords: the row number of the verzekerdenrecord each
+# prestatierecord follows in the file (-1 if none), so merge_data can link them by position
+INSURED_INDEX = "Index verzekerdenrecord"
+
+# Layouts per berichtstandaard version ("versie.subversie"), None is the default layout.
+# A new version only needs the record kinds that differ, all others fall back to the default.
+RECORD_LAYOUTS = {
+    None: {
+        "01": VOORLOOPRECORD,
+        "02": VERZEKERDENRECORD,
+        "04": PRESTATIERECORD,
+        "98": COMMENTAARRECORD,
+        "99": SLUITRECORD,
+    },
+}
+
+
+def register_layout(version, kind, fields):
+    """
+    Adds or replaces the layout of one record kind for a berichtstandaard version.
+    """
+    RECORD_LAYOUTS.setdefault(version, {})[kind] = fields
+    compile_layout.cache_clear()
+
+
+def standard_version(versienummer, subversienummer):
+    """
+    Combines the Versienummer and Subversienummer berichtstandaard of the voorlooprecord.
+    Returns the version key used in RECORD_LAYOUTS.
+    """
+    return f"{versienummer.strip()}.{subversienummer.strip()}"
+
+
+def record_layout(kind, version=None):
+    """
+    Looks up the fields of a record kind for the given berichtstandaard version.
+    Returns the layout of that version, or the default layout if the version has none.
+    """
+    layout = RECORD_LAYOUTS.get(version, {}).get(kind)
+    if layout is None:
+        layout = RECORD_LAYOUTS[None][kind]
+    return layout
+
+
+@lru_cache(maxsize=None)
+def compile_layout(kind, version=None):
+    """
+    Turns a record layout into a precomputed extraction plan.
+    Returns the field names and an itemgetter that slices all fields of a line in one call.
+    """
+    fields = record_layout(kind, version)
+    names = tuple(field[0] for field in fields)
+    getter = itemgetter(*(slice(start, end) for _, start, end, _, _ in fields))
+    return names, getter
+
+
+def parse_record(line, kind, version=None):
+    """
+    Parse the given line into its respective fields using the compiled layout of its kind.
+    Returns a dictionary with the parsed values.
+    """
+
+    # Make sure the line is at least 310 chars
+    if len(line) < RECORD_LENGTH:
+        raise ValueError("Line must be at least 310 characters long.")
+
+    names, getter = compile_layout(kind, version)
+    return dict(zip(names, map(str.strip, getter(line))))
@@ -0,0 +1,547 @@
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+
+# Version of the rule set, part of the cache key of checked uploads: increase it when rules change
+RULESET_VERSION = 1
+
+# Placeholder for the patient column in grouping keys: BSN for mz301, Patientgegevens for excel
+PATIENT = "Patient"
+
+PATIENT_DAY = (PATIENT, "Datum prestatie")
+PATIENT_DAY_ELEMENT = (PATIENT, "Datum prestatie", "Gebitselementcode")
+PATIENT_DAY_KAAK = (PATIENT, "Datum prestatie", "Kaak")
+
+
+class CodeIndex:
+    """
+    Classifies the Prestatiecodes of a dataframe once per distinct code.
+    The column is factorized into integer codes, code classes are matched against the
+    unique codes only and looked up per row through the integer codes.
+    A class is a regex pattern (str.contains) or a tuple of exact codes.
+    """
+
+    def __init__(self, prestatiecodes):
+        # missing codes get -1, which indexes the extra False entry of every lookup table
+        self.codes, self.uniques = pd.factorize(prestatiecodes)
+        self.uniques = pd.Series(pd.Index(self.uniques).astype(str))
+        self._tables = {}
+
+    def table(self, code_class):
+        """
+        Returns per unique code whether it belongs to the class, with a trailing False for missing codes.
+        """
+        if code_class not in self._tables:
+            if isinstance(code_class, tuple):
+                matches = self.uniques.isin(code_class)
+            else:
+                matches = self.uniques.str.contains(code_class)
+            self._tables[code_class] = np.append(matches.to_numpy(dtype=bool), False)
+        return self._tables[code_class]
+
+    def flags(self, code_class):
+        """
+        Returns per row whether its Prestatiecode belongs to the class.
+        """
+        return self.table(code_class)[self.codes]
+
+    def matrix(self, classes):
+        """
+        Returns a (rows x classes) flag matrix, taking one row of the per-code table per prestatie.
+        """
+        return np.column_stack([self.table(c) for c in classes])[self.codes]
+
+
+class Groups:
+    """
+    Computes every grouping key of a dataframe once and shares it between rules.
+    Rows with a missing key value belong to no group, like in df.groupby.
+    """
+
+    def __init__(self, df, patient_key, history=None, source=None):
+        self.df = df
+        self.patient_key = patient_key
+        self.history = history
+        self.source = source
+        self._ids = {}
+        self._segments = {}
+        self._codes = None
+
+    def ids(self, keys):
+        """
+        Returns the group number of every row (-1 if it has no group) and the number of groups.
+        """
+        if keys not in self._ids:
+            columns = [self.patient_key if key == PATIENT else key for key in keys]
+            ids = self.df.groupby(columns, sort=False, observed=True).ngroup()
+            self._ids[keys] = (ids.fillna(-1).to_numpy(dtype=np.int64), int(ids.max() + 1) if ids.notna().any() else 0)
+        return self._ids[keys]
+
+    def count(self, keys, mask):
+        """
+        Returns per row how many rows of its group match the mask.
+        """
+        ids, n_groups = self.ids(keys)
+        grouped = ids >= 0
+        counts = np.bincount(ids[grouped], weights=np.asarray(mask, dtype=bool)[grouped], minlength=n_groups)
+        # rows without a group (-1) index the trailing 0, also when there are no groups at all
+        return np.append(counts, 0)[ids].astype(np.int64)
+
+    def sizes(self, keys):
+        """
+        Returns per row the number of rows in its group (0 if it has no group).
+        """
+        ids, n_groups = self.ids(keys)
+        grouped = ids >= 0
+        sizes = np.bincount(ids[grouped], minlength=n_groups)
+        return np.append(sizes, 0)[ids]
+
+    def any(self, keys, mask):
+        """
+        Returns per row whether any row of its group matches the mask.
+        """
+        return self.count(keys, mask) > 0
+
+    def segments(self, keys):
+        """
+        Returns the row order that puts every group in one consecutive segment
+        (rows without a group left out) and the start of each segment.
+        """
+        if keys not in self._segments:
+            ids, n_groups = self.ids(keys)
+            order = np.argsort(ids, kind="stable")
+            order = order[ids[order] >= 0]
+            starts = np.searchsorted(ids[order], np.arange(n_groups))
+            self._segments[keys] = (order, starts)
+        return self._segments[keys]
+
+    def any_per_class(self, keys, flags):
+        """
+        Segmented OR-reduction of a (rows x classes) flag matrix over the groups.
+        Returns per row and class whether any row of its group has the flag.
+        """
+        ids, n_groups = self.ids(keys)
+        if n_groups == 0:
+            return np.zeros(flags.shape, dtype=bool)
+
+        order, starts = self.segments(keys)
+        group_any = np.logical_or.reduceat(flags[order], starts, axis=0)
+        return group_any[ids] & (ids >= 0)[:, None]
+
+    @property
+    def codes(self):
+        """
+        The CodeIndex of the Prestatiecode column, built on first use.
+        """
+        if self._codes is None:
+            self._codes = CodeIndex(self.df["Prestatiecode"])
+        return self._codes
+
+    def flags(self, code_class):
+        """
+        Flags the rows whose Prestatiecode belongs to a code class, see CodeIndex.
+        """
+        return self.codes.flags(code_class)
+
+
+class Rule:
+    """
+    A declaration check that marks the rows violating it.
+    """
+
+    def __init__(self, rule_id, title, section):
+        self.rule_id = rule_id
+        self.title = title
+        self.section = section
+
+    @property
+    def family(self):
+        """
+        Rules of the same type and family are evaluated together by evaluate_family.
+        """
+        return self.rule_id
+
+    def evaluate(self, df, groups):
+        """
+        Returns a boolean array with True for every row that violates the rule.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def evaluate_family(cls, rules, df, groups):
+        """
+        Returns the violation mask of every rule in the family by rule_id.
+        """
+        return {rule.rule_id: rule.evaluate(df, groups) for rule in rules}
+
+
+class RowRule(Rule):
+    """
+    A check on single rows, given as a vectorized predicate on the dataframe.
+    With a code class (see CodeIndex) only rows with a Prestatiecode of that class violate it,
+    looked up through the shared Groups; without a predicate all those rows do.
+    """
+
+    def __init__(self, rule_id, title, section, predicate=None, codes=None):
+        super().__init__(rule_id, title, section)
+        self.predicate = predicate
+        self.codes = codes
+
+    def evaluate(self, df, groups):
+        violating = groups.flags(self.codes) if self.codes is not None else np.ones(len(df), dtype=bool)
+        if self.predicate is not None:
+            violating = violating & np.asarray(self.predicate(df), dtype=bool)
+        return violating
+
+
+class GroupRule(Rule):
+    """
+    A check on groups of rows, given as a vectorized predicate on the dataframe
+    and the shared Groups, e.g. groups.count(PATIENT_DAY, mask).
+    """
+
+    def __init__(self, rule_id, title, section, predicate):
+        super().__init__(rule_id, title, section)
+        self.predicate = predicate
+
+    def evaluate(self, df, groups):
+        return np.asarray(self.predicate(df, groups), dtype=bool)
+
+
+class CoOccurrenceRule(Rule):
+    """
+    Codes of two classes that may not occur in the same group, e.g. C- and T-codes
+    on the same behandeldatum. Rows of the `flagged` class in such a group violate it.
+    Code classes are regex patterns or tuples of exact codes, see CodeIndex.
+    """
+
+    def __init__(self, rule_id, title, section, keys, first, second, flagged):
+        super().__init__(rule_id, title, section)
+        self.keys = keys
+        self.first = first
+        self.second = second
+        self.flagged = flagged
+
+    @property
+    def family(self):
+        return self.keys
+
+    def evaluate(self, df, groups):
+        return self.evaluate_family([self], df, groups)[self.rule_id]
+
+    @classmethod
+    def evaluate_family(cls, rules, df, groups):
+        # one segmented reduction over the flags of every class in the family
+        classes = list(dict.fromkeys(c for rule in rules for c in (rule.first, rule.second)))
+        flags = groups.codes.matrix(classes)
+        group_any = groups.any_per_class(rules[0].keys, flags)
+
+        column = {c: i for i, c in enumerate(classes)}
+        return {rule.rule_id: (group_any[:, column[rule.first]]
+                               & group_any[:, column[rule.second]]
+                               & groups.flags(rule.flagged))
+                for rule in rules}
+
+
+class FrequencyLimitRule(Rule):
+    """
+    A Prestatiecode that may occur at most `maximum` times per group,
+    e.g. V30 at most once on the same behandeldatum.
+    """
+
+    def __init__(self, rule_id, title, section, keys, prestatiecode, maximum):
+        super().__init__(rule_id, title, section)
+        self.keys = keys
+        self.prestatiecode = prestatiecode
+        self.maximum = maximum
+
+    @property
+    def family(self):
+        return self.keys
+
+    def evaluate(self, df, groups):
+        return self.evaluate_family([self], df, groups)[self.rule_id]
+
+    @classmethod
+    def evaluate_family(cls, rules, df, groups):
+        # one group size pass over (keys..., Prestatiecode) counts every code of the family
+        counts = groups.sizes(rules[0].keys + ("Prestatiecode",))
+        return {rule.rule_id: groups.flags((rule.prestatiecode,)) & (counts > rule.maximum)
+                for rule in rules}
+
+
+class HistoricalFrequencyRule(Rule):
+    """
+    A Prestatiecode that may occur at most `maximum` times per group within `window_days` days,
+    counting the prestaties of earlier files in the HistoryIndex passed to evaluate_rules too.
+    Keys don't include the date, e.g. (PATIENT, "Gebitselementcode") for once per element.
+    A row violates it if, up to and including its date, the window holds more than `maximum`.
+    """
+
+    def __init__(self, rule_id, title, section, keys, prestatiecode, maximum, window_days):
+        super().__init__(rule_id, title, section)
+        self.keys = keys
+        self.prestatiecode = prestatiecode
+        self.maximum = maximum
+        self.window_days = window_days
+
+    def evaluate(self, df, groups):
+        columns = [groups.patient_key if key == PATIENT else key for key in self.keys]
+        rows = groups.flags((self.prestatiecode,))
+        current = df.loc[rows, columns + ["Datum prestatie"]]
+
+        prior = current.iloc[:0]
+        if groups.history is not None and len(current):
+            prior = groups.history.prestaties(current[groups.patient_key].dropna().unique(), (self.prestatiecode,),
+                                              exclude_referenties=df["Referentienummer"].unique(),
+                                              exclude_source=groups.source)
+            prior = prior.rename(columns={"BSN": groups.patient_key})[columns + ["Datum prestatie"]]
+
+        # one sorted key per prestatie: group number in the high bits, day number in the low bits
+        combined = pd.concat([current.astype(object), prior.astype(object)], ignore_index=True)
+        group = combined.groupby(columns, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        days = pd.to_datetime(combined["Datum prestatie"]).to_numpy(dtype="datetime64[D]")
+        valid = (group >= 0) & ~np.isnat(days)
+        key = (group << 32) + days.astype(np.int64) + (1 << 31)
+
+        history_keys = np.sort(key[valid])
+        current_key = key[:len(current)]
+        counts = (np.searchsorted(history_keys, current_key, side="right")
+                  - np.searchsorted(history_keys, current_key - (self.window_days - 1), side="left"))
+
+        violated = np.zeros(len(df), dtype=bool)
+        violated[np.flatnonzero(rows)] = valid[:len(current)] & (counts > self.maximum)
+        return violated
+
+
+def frequency_limit_rules(limits, section):
+    """
+    Creates a FrequencyLimitRule for every (prestatiecode, grouping key, maximum) in the table.
+    Returns the rules in table order.
+    """
+    rules = []
+    for prestatiecode, keys, maximum in limits:
+        element = " en element" if "Gebitselementcode" in keys else ""
+        title = f"{prestatiecode} mag maximaal {maximum} keer op dezelfde behandeldatum{element} voorkomen"
+        rules.append(FrequencyLimitRule(prestatiecode, title, section, keys, prestatiecode, maximum))
+    return rules
+
+
+def historical_frequency_rules(limits, section):
+    """
+    Creates a HistoricalFrequencyRule for every (prestatiecode, grouping key, maximum, days) in the table.
+    Returns the rules in table order.
+    """
+    rules = []
+    for prestatiecode, keys, maximum, window_days in limits:
+        element = " per element" if "Gebitselementcode" in keys else ""
+        title = f"{prestatiecode} mag maximaal {maximum} keer{element} binnen {window_days} dagen voorkomen, ook over eerdere bestanden"
+        rules.append(HistoricalFrequencyRule(f"{prestatiecode}-historie", title, section, keys, prestatiecode, maximum, window_days))
+    return rules
+
+
+def evaluate_rules(df, rules, patient_key, history=None, source=None):
+    """
+    Evaluates all rules on the dataframe, computing every grouping key only once
+    and evaluating rules of the same family together. HistoricalFrequencyRules also
+    count the prestaties of earlier files in the history (a HistoryIndex), if given,
+    except those added under the source (content hash) of the file being validated.
+    Returns a violations dataframe with the rule_id and row (index label) of every violation.
+    """
+    groups = Groups(df, patient_key, history, source)
+
+    families = defaultdict(list)
+    for rule in rules:
+        families[(type(rule), rule.family)].append(rule)
+
+    masks = {}
+    for (rule_type, _), family in families.items():
+        masks.update(rule_type.evaluate_family(family, df, groups))
+
+    rule_ids, rows = [], []
+    for rule in rules:
+        violated = df.index[masks[rule.rule_id]]
+        rule_ids.extend([rule.rule_id] * len(violated))
+        rows.extend(violated)
+
+    return pd.DataFrame({"rule_id": rule_ids, "row": rows})
+
+
+def evaluate_rules_chunked(chunks, rules, patient_key):
+    """
+    Evaluates all rules on dataframe chunks sorted by Datum prestatie, so large files never have
+    to be in memory at once. Every rule groups per patient-day or finer, so the rows of a date
+    are complete once a later date shows up; only the rows of the last date wait for the next chunk.
+    Yields every completed part of the data with its violations, like evaluate_rules.
+    """
+    pending = None
+    last_date = None
+    for chunk in chunks:
+        dates = chunk["Datum prestatie"].dropna()
+        if len(dates):
+            if not dates.is_monotonic_increasing or (last_date is not None and dates.iloc[0] < last_date):
+                raise ValueError("Data must be sorted by Datum prestatie.")
+            last_date = dates.iloc[-1]
+
+        df = chunk if pending is None else pd.concat([pending, chunk])
+
+        # rows without a date belong to no patient-day and are complete right away
+        waiting = (df["Datum prestatie"] == last_date).to_numpy(dtype=bool)
+        complete, pending = df[~waiting], df[waiting]
+        if len(complete):
+            yield complete, evaluate_rules(complete, rules, patient_key)
+
+    if pending is not None and len(pending):
+        yield pending, evaluate_rules(pending, rules, patient_key)
+
+
+### predicates ##################################################################
+
+def missing_machtiging(df):
+    # missing, empty or fewer than 5 characters
+    return df["Machtigingsnummer"].str.len().fillna(0) < 5
+
+
+def p045_per_kaak(df, groups):
+    # excel exports use "Bovenkaak" and "Onderkaak" as element too: those P045s are counted
+    # on their own, apart from the P045s on the teeth of the same jaw
+    p045 = groups.flags(("P045",))
+    hele_kaak = df["Gebitselementcode"].isin(["Bovenkaak", "Onderkaak"]).to_numpy(dtype=bool)
+    per_kaak = groups.count(PATIENT_DAY_KAAK, p045 & hele_kaak)
+    per_element = groups.count(PATIENT_DAY_KAAK, p045 & ~hele_kaak)
+    return p045 & (np.where(hele_kaak, per_kaak, per_element) > 8)
+
+
+def techniek_rule(prestatiecode, euros, minimum):
+    """
+    Techniekkosten (Indicatie soort prestatierecord "02") below the minimum or above the maximum.
+    """
+    if minimum:
+        title = f"{prestatiecode} minimale techniekkosten van {euros} euro"
+        section = "Minimale techniek kosten"
+    else:
+        title = f"{prestatiecode} maximale techniekkosten van {euros} euro"
+        section = "Maximale techniek kosten"
+
+    def predicate(df):
+        techniek = df["Indicatie soort prestatierecord"] == "02"
+        if minimum:
+            return techniek & (df["Tarief prestatie"] < euros * 100)  # bedragen in cents
+        return techniek & (df["Tarief prestatie"] > euros * 100)
+
+    return RowRule(prestatiecode, title, section, predicate, codes=(prestatiecode,))
+
+
+### rules #######################################################################
+
+C_T = CoOccurrenceRule(
+    "C-T", "C- en T-codes mogen niet op dezelfde behandeldatum voorkomen", "Code combinaties",
+    PATIENT_DAY, first="C", second="T", flagged="C|T")
+
+A10_H = CoOccurrenceRule(
+    "A10-H", "A10- en H-codes mogen niet op dezelfde behandeldatum en element voorkomen", "Code combinaties",
+    PATIENT_DAY_ELEMENT, first="A10", second="H", flagged="A10|H")
+
+E02_C = CoOccurrenceRule(
+    "E02-C", "E02 en C001, C002 of C003 mogen niet op dezelfde behandeldatum voorkomen", "Code combinaties",
+    PATIENT_DAY, first=("E02",), second=("C001", "C002", "C003"), flagged="E02|C001|C002|C003")
+
+# (prestatiecode, grouping key, maximum number of times)
+FREQUENCY_LIMITS = [
+    ("V30", PATIENT_DAY, 1),
+    ("V35", PATIENT_DAY_ELEMENT, 1),
+    ("P045", PATIENT_DAY_ELEMENT, 1),
+    ("C022", PATIENT_DAY, 4),
+    ("T102", PATIENT_DAY, 1),
+]
+
+V30, V35, P045, C022, T102 = frequency_limit_rules(FREQUENCY_LIMITS, "Code combinaties")
+
+G72 = RowRule(
+    "G72", "G72 mag niet gedeclareerd worden", "Code combinaties",
+    codes=("G72",))
+
+J049 = RowRule(
+    "J049", "J049 vereist machtigingsnummer en voorloopcode 002", "Code combinaties",
+    lambda df: df["Geboortedatum"].isna() | missing_machtiging(df), codes=("J049",))
+
+P045_ELEMENT = RowRule(
+    "P045-element", "P045 vereist vermelding van elementnummer", "Code combinaties",
+    lambda df: df["Gebitselementcode"].str.len().fillna(0) != 2, codes=("P045",))
+
+P045_KAAK = GroupRule(
+    "P045-kaak", "P045 mag maximal 8x voorkomen voor onder- of bovenkaak op zelfde datum", "Code combinaties",
+    p045_per_kaak)
+
+J042_R = CoOccurrenceRule(
+    "J042-R", "J042 en J043 mag niet op dezelfde behandeldatum voorkomen met R-codes", "Code combinaties",
+    PATIENT_DAY, first=("J042", "J043"), second="R", flagged="J042|J043|R")
+
+J042_J040 = CoOccurrenceRule(
+    "J042-J040", "J042 en J043 mag niet op dezelfde behandeldatum voorkomen met J040 of J041", "Code combinaties",
+    PATIENT_DAY, first=("J042", "J043"), second=("J040", "J041"), flagged="J042|J043|J040|J041")
+
+X21 = RowRule(
+    "X21", "X21 voor patiënten jonger dan 18 jaar vereist machtigingsnummer", "Onder 18 jaar",
+    lambda df: (df["Leeftijd"] < 18) & missing_machtiging(df), codes=("X21",))
+
+G_VGZ = RowRule(
+    "G-VGZ", "G-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", "Onder 18 jaar",
+    lambda df: (df["Leeftijd"] < 18) & df["Verzekering"].str.contains("VGZ", na=False) & missing_machtiging(df),
+    codes=("G",))
+
+T_VGZ = RowRule(
+    "T-VGZ", "T-codes voor patiënten jonger dan 18 jaar vereist machtigingsnummer bij VGZ", "Onder 18 jaar",
+    lambda df: (df["Leeftijd"] < 18) & df["Verzekering"].str.contains("VGZ", na=False) & missing_machtiging(df),
+    codes=("T",))
+
+NEGATIEF = RowRule(
+    "negatief", "Negatief bedrag", "Overige Checks",
+    lambda df: (df["Totaal Bedrag"] < 0) | (df["Techniek"] < 0) | (df["Honorarium"] < 0))
+
+MINIMALE_TECHNIEK = [
+    techniek_rule("R24", 250, minimum=True),
+    techniek_rule("R34", 525, minimum=True),
+    techniek_rule("F471A", 400, minimum=True),
+    techniek_rule("F461A", 400, minimum=True),
+    techniek_rule("F813A", 25, minimum=True),
+    techniek_rule("G69", 130, minimum=True),
+]
+
+MAXIMALE_TECHNIEK = [
+    techniek_rule("P023", 325, minimum=False),
+    techniek_rule("P020", 380, minimum=False),
+    techniek_rule("P022", 705, minimum=False),
+    techniek_rule("P068", 76, minimum=False),
+    techniek_rule("P062", 109, minimum=False),
+    techniek_rule("J100", 217, minimum=False),
+    techniek_rule("J101", 217, minimum=False),
+    techniek_rule("J104", 93, minimum=False),
+]
+
+# (prestatiecode, grouping key, maximum number of times, window in days), checked against the HistoryIndex
+HISTORICAL_LIMITS = [
+    ("V35", (PATIENT, "Gebitselementcode"), 1, 365),
+]
+
+# These rules look across dates, so they are left out of the per-day incremental and chunked evaluation
+HISTORY_RULES = historical_frequency_rules(HISTORICAL_LIMITS, "Historie")
+
+MZ301_RULES = [
+    C_T, A10_H, E02_C, G72, J049, V30, V35, P045, P045_ELEMENT, P045_KAAK,
+    X21, G_VGZ, T_VGZ,
+    *MINIMALE_TECHNIEK,
+    *MAXIMALE_TECHNIEK,
+]
+
+# Excel exports have no Machtigingsnummer, Verzekering or Indicatie soort prestatierecord,
+# elements can also be "Bovenkaak" or "Onderkaak" instead of a tooth number
+P045_ELEMENT_EXCEL = RowRule(
+    "P045-element", "P045 vereist vermelding van elementnummer", "Code combinaties",
+    lambda df: df["Gebitselementcode"].isna() | (df["Gebitselementcode"] == ""), codes=("P045",))
+
+EXCEL_RULES = [
+    C_T, A10_H, E02_C, G72, V30, V35, P045, P045_ELEMENT_EXCEL, P045_KAAK,
+    C022, J042_R, J042_J040, T102,
+    NEGATIEF,
+]
@@ -0,0 +1,163 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline import PIPELINES, validate_report
+
+
+class Job:
+    """
+    One upload waiting for, going through or done with validation.
+    Its status is "queued", "running", "done" or "failed".
+    """
+
+    def __init__(self, kind, data):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.data = data
+        self.status = "queued"
+        self.report = None
+        self.error = None
+        self.finished = asyncio.Event()
+        self.finished_at = None
+
+    def finish(self, status, error=None):
+        """
+        Marks the job as done or failed and wakes up whoever waits for its result.
+        """
+        self.status = status
+        self.error = error
+        # the upload is not needed anymore once it is validated
+        self.data = None
+        self.finished_at = time.monotonic()
+        self.finished.set()
+
+
+class ValidationService:
+    """
+    Validates uploads in the background: uploads wait on a bounded asyncio queue and
+    `workers` worker tasks run the pipeline in an executor, one upload each at a time.
+    A full queue makes submit wait, which passes back-pressure on to the clients.
+    Finished jobs are kept for `keep_seconds`, and at most `max_finished` of them,
+    so reports that are never fetched or forgotten don't pile up.
+
+        async with ValidationService(workers=4) as service:
+            job_id = await service.submit("mz301", data)
+            report = await service.result(job_id)
+    """
+
+    def __init__(self, workers=2, max_queued=32, executor=None, keep_seconds=3600, max_finished=256):
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=max_queued)
+        self.keep_seconds = keep_seconds
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._tasks = []
+
+    async def start(self):
+        """
+        Starts the executor (a process pool unless one was given) and the worker tasks.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Stops the worker tasks. Jobs that did not finish fail, so nobody keeps waiting for them.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+        for job in self.jobs.values():
+            if not job.finished.is_set():
+                job.finish("failed", "validation service stopped")
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def submit(self, kind, data):
+        """
+        Queues file content for validation, waiting while the queue is full.
+        Returns the job id.
+        """
+        if kind not in PIPELINES:
+            raise ValueError(f"Unknown kind of file: {kind}.")
+
+        self._expire()
+        job = Job(kind, data)
+        self.jobs[job.job_id] = job
+        await self.queue.put(job)
+        return job.job_id
+
+    def status(self, job_id):
+        """
+        Returns the status of a job, raises KeyError for unknown or expired jobs.
+        """
+        return self.jobs[job_id].status
+
+    async def result(self, job_id):
+        """
+        Waits for a job to finish, raises KeyError for unknown or expired jobs.
+        Returns its violations report, or raises RuntimeError if the validation failed.
+        """
+        job = self.jobs[job_id]
+        await job.finished.wait()
+        if job.status == "failed":
+            raise RuntimeError(f"Validation of job {job_id} failed: {job.error}")
+        return job.report
+
+    async def stream(self, job_id, chunk_size=1000):
+        """
+        Waits for a job to finish and yields its finished violations report in parts of chunk_size rows,
+        so a large report can be sent on page by page instead of in one response.
+        """
+        report = await self.result(job_id)
+        for start in range(0, len(report), chunk_size):
+            yield report.iloc[start:start + chunk_size]
+
+    def forget(self, job_id):
+        """
+        Removes a finished job and its report from the service.
+        """
+        if not self.jobs[job_id].finished.is_set():
+            raise ValueError(f"Job {job_id} has not finished.")
+        del self.jobs[job_id]
+
+    def _expire(self):
+        # drop finished jobs past their time, then the oldest ones over the limit
+        finished = sorted((job.finished_at, job_id) for job_id, job in self.jobs.items() if job.finished.is_set())
+        cutoff = time.monotonic() - self.keep_seconds
+        expired = [job_id for finished_at, job_id in finished if finished_at < cutoff]
+        expired += [job_id for _, job_id in finished[len(expired):len(finished) - self.max_finished]]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            try:
+                job.report = await loop.run_in_executor(self._executor, validate_report, job.kind, job.data)
+                job.finish("done")
+            except Exception as e:
+                job.finish("failed", f"{type(e).__name__}: {e}")
+            finally:
+                self.queue.task_done()
+                self._expire()
@@ -0,0 +1,33 @@
+"""
+Builds small synthetic excel exports for the tests.
+"""
+import random
+from datetime import datetime
+
+import clean_data_excel
+
+
+def export_rows(n=600, seed=1, days=20):
+    """
+    Rows of an excel export over `days` dates sorted by Datum, the header row first. Elementen and
+    PatientInfo hold numbers as well as text, so some chunks have only numbers in those columns.
+    """
+    rng = random.Random(seed)
+    codes = ["C002", "T021", "E02", "V30", "V35", "P045", "A10", "H11", "G72", "C022", "J042", "J040", "R24", "T102"]
+    elements = [11, 21, 36, 45, "Bovenkaak", "Onderkaak", None]
+    patients = [1001, 1002, 1003, "P4", "P5"]
+
+    rows = []
+    for _ in range(n):
+        rows.append(["X", rng.choice(patients), datetime(1980, 1, 1), datetime(2024, 1, rng.randint(1, days)),
+                     rng.choice(codes), rng.choice(elements), rng.choice([10.5, -1.0, None]), 3.25, 5.0])
+    rows.sort(key=lambda row: row[3])
+    return [list(clean_data_excel.EXCEL_COLUMNS)] + rows
+
+
+def export_frame(n=600, seed=1, days=20):
+    """
+    Returns the cleaned frame of a synthetic excel export, see export_rows.
+    """
+    rows = export_rows(n, seed, days)
+    return clean_data_excel.clean_data(next(clean_data_excel.excel_chunks(rows, len(rows))))
@@ -0,0 +1,82 @@
+"""
+Builds small synthetic MZ301 files for the tests.
+"""
+import random
+
+from record_layouts import (
+    COMMENTAARRECORD,
+    PRESTATIERECORD,
+    RECORD_LENGTH,
+    SLUITRECORD,
+    VERZEKERDENRECORD,
+    VOORLOOPRECORD,
+)
+
+CODES = ["C002", "C003", "T021", "E02", "V30", "V35", "P045", "A10", "H11", "G72", "X21", "R24",
+         "J049", "M03", "P045", "P045", "G", "T", "P023"]
+ELEMENTS = ["11", "21", "36", "45", "", "1"]
+
+
+def record(fields, values):
+    """
+    Lays out the given field values in one fixed-width line, other fields are left blank.
+    """
+    line = [" "] * RECORD_LENGTH
+    for name, start, end, *_ in fields:
+        line[start:end] = str(values.get(name, ""))[:end - start].ljust(end - start)
+    return "".join(line)
+
+
+def mz301_lines(patients=20, prestaties=8, seed=0, elements=ELEMENTS, bsns=None, referenties=True):
+    """
+    Returns the lines of an MZ301 file with `prestaties` random prestatierecords per verzekerdenrecord.
+    bsns gives the BSN per verzekerdenrecord, by default every patient has its own.
+    Without referenties the Referentienummers are left blank.
+    """
+    rng = random.Random(seed)
+    bsns = bsns or [f"{100000000 + i:09d}" for i in range(patients)]
+    lines = [record(VOORLOOPRECORD, {
+        "Kenmerk record": "01", "Versienummer berichtstandaard": "12", "Subversienummer berichtstandaard": "01",
+        "Begindatum declaratieperiode": "20240101", "Einddatum declaratieperiode": "20240131",
+    })]
+
+    n_prestaties = total = 0
+    for i, bsn in enumerate(bsns):
+        lines.append(record(VERZEKERDENRECORD, {
+            "Kenmerk record": "02", "Identificatie detailrecord": f"{len(lines):012d}",
+            "Burgerservicenummer (bsn) verzekerde": bsn, "Uzovi-nummer": rng.choice(["0101", "7095", "3311"]),
+            "Datum geboorte verzekerde": f"{rng.randint(1950, 2015)}0{rng.randint(1, 9)}1{rng.randint(0, 9)}",
+            "Naam verzekerde (01)": f"Naam{i}",
+        }))
+        for _ in range(prestaties):
+            bedrag = rng.randint(0, 90000)
+            debet_credit = rng.choice("DDDC")
+            total += -bedrag if debet_credit == "C" else bedrag
+            lines.append(record(PRESTATIERECORD, {
+                "Kenmerk record": "04", "Identificatie detailrecord": f"{len(lines):012d}",
+                "Burgerservicenummer (bsn) verzekerde": bsn, "Datum prestatie": f"202401{rng.randint(10, 11)}",
+                "Indicatie soort prestatierecord": rng.choice(["01", "02"]), "Prestatiecode": rng.choice(CODES),
+                "Gebitselementcode": rng.choice(elements), "Tarief prestatie (incl. btw)": f"{bedrag:08d}",
+                "Aantal uitgevoerde prestaties": "0001", "Berekend bedrag (incl. btw)": f"{bedrag:08d}",
+                "Indicatie debet/credit (01)": debet_credit, "Declaratiebedrag (incl. btw)": f"{bedrag:08d}",
+                "Indicatie debet/credit (02)": debet_credit,
+                "Referentienummer dit prestatierecord": f"REF{n_prestaties}" if referenties else "",
+                "Machtigingsnummer": rng.choice(["", "123", "1234567"]),
+            }))
+            n_prestaties += 1
+
+    lines.append(record(COMMENTAARRECORD, {"Kenmerk record": "98", "Vrije tekst": "opmerking"}))
+    lines.append(record(SLUITRECORD, {
+        "Kenmerk record": "99", "Aantal verzekerdenrecords": f"{len(bsns):06d}",
+        "Aantal prestatierecords": f"{n_prestaties:06d}", "Aantal commentaarrecords": "000001",
+        "Totaal aantal detailrecords": f"{len(bsns) * 2 + n_prestaties + 1:07d}",
+        "Totaal declaratiebedrag": f"{abs(total):011d}", "Indicatie debet enof credit": "D" if total >= 0 else "C",
+    }))
+    return lines
+
+
+def mz301_bytes(**options):
+    """
+    Returns the content of an MZ301 file, see mz301_lines.
+    """
+    return "".join(line + "\r\n" for line in mz301_lines(**options)).encode("ISO-8859-1")
@@ -0,0 +1,48 @@
+import pandas as pd
+
+import batch
+
+
+class SerialPool:
+    """Stands in for ProcessPoolExecutor; runs a file when its result is collected."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.outstanding = self.max_outstanding = 0
+        pools.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        pool = self
+        pool.outstanding += 1
+        pool.max_outstanding = max(pool.max_outstanding, pool.outstanding)
+
+        class Future:
+            def result(self):
+                pool.outstanding -= 1
+                return fn(*args)
+
+        return Future()
+
+
+pools = []
+
+
+def test_history_files_are_validated_one_at_a_time_in_order(tmp_path, monkeypatch):
+    order = []
+    monkeypatch.setattr(batch, "_validate_in_worker",
+                        lambda path, kind, timeout, history_path, stream: order.append(path) or pd.DataFrame())
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", SerialPool)
+    pools.clear()
+
+    paths = [f"{i}.txt" for i in range(5)]
+    results = list(batch.validate_files(paths, workers=4, history_path=str(tmp_path / "history.sqlite")))
+
+    assert [path for path, _, _ in results] == order == paths
+    assert pools[0].max_workers == 1
+    assert pools[0].max_outstanding == 1
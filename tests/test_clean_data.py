@@ -0,0 +1,53 @@
+import io
+
+import pandas as pd
+
+from clean_data import merge_data
+from mz301_files import mz301_bytes
+from parse_data import read_mz301
+from record_layouts import INSURED_INDEX
+
+BSN = "Burgerservicenummer (bsn) verzekerde"
+
+
+def parsed(**options):
+    df_voorlooprecord, df_verzekerdenrecord, df_prestatierecord, *_ = read_mz301(io.BytesIO(mz301_bytes(**options)))
+    return df_verzekerdenrecord, df_prestatierecord
+
+
+def old_merge(df_verzekerdenrecord, df_prestatierecord):
+    # merge_data before the sorted lookup, with one verzekerdenrecord per BSN
+    df_1 = df_verzekerdenrecord[['Identificatie detailrecord', BSN, 'Datum geboorte verzekerde',
+                                 'Naam verzekerde (01)', 'Voorletters verzekerde', 'Uzovi-nummer']]
+    df_2 = df_prestatierecord[['Identificatie detailrecord', BSN, 'Machtigingsnummer', 'Datum prestatie',
+                               'Indicatie soort prestatierecord', 'Prestatiecode', 'Gebitselementcode',
+                               'Tarief prestatie (incl. btw)', 'Aantal uitgevoerde prestaties',
+                               'Berekend bedrag (incl. btw)', 'Declaratiebedrag (incl. btw)',
+                               'Referentienummer dit prestatierecord']]
+    return pd.merge(df_1.drop_duplicates(subset=BSN), df_2, on=BSN, how="right")
+
+
+def test_merge_matches_pandas_merge_for_unique_bsns():
+    df_verzekerdenrecord, df_prestatierecord = parsed(patients=25, prestaties=6, seed=4)
+    expected = old_merge(df_verzekerdenrecord, df_prestatierecord)
+
+    for df_prestaties in [df_prestatierecord, df_prestatierecord.drop(columns=[INSURED_INDEX])]:
+        merged = merge_data(df_verzekerdenrecord, df_prestaties)
+        pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+
+
+def test_repeated_bsns_keep_one_row_per_prestatie():
+    bsns = ["100000001", "100000002", "100000001", "100000003", "100000002"]
+    df_verzekerdenrecord, df_prestatierecord = parsed(bsns=bsns, prestaties=3, seed=4)
+    merged = merge_data(df_verzekerdenrecord, df_prestatierecord)
+
+    assert len(merged) == len(df_prestatierecord) == 15
+    # every prestatierecord is linked to the verzekerdenrecord it follows in the file
+    assert merged["Naam verzekerde (01)"].tolist() == [f"Naam{i // 3}" for i in range(15)]
+    assert merged[BSN].tolist() == [bsn for bsn in bsns for _ in range(3)]
+
+    # without the file position, the first verzekerdenrecord of the BSN is used
+    by_bsn = merge_data(df_verzekerdenrecord, df_prestatierecord.drop(columns=[INSURED_INDEX]))
+    assert len(by_bsn) == 15
+    first = {"100000001": "Naam0", "100000002": "Naam1", "100000003": "Naam3"}
+    assert by_bsn["Naam verzekerde (01)"].tolist() == [first[bsn] for bsn in by_bsn[BSN]]
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+import batch
+import clean_data_excel
+import pipeline
+from excel_files import export_rows
+from rules import EXCEL_RULES, evaluate_rules
+
+
+def test_excel_chunk_formats_whole_numbers_like_read_excel():
+    rows = export_rows(20)
+    for chunk in clean_data_excel.excel_chunks(rows, 3):
+        for col in ["PatientInfo", "Elementen"]:
+            assert not chunk[col].dropna().str.endswith(".0").any()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100])
+def test_streaming_matches_full_read(monkeypatch, chunk_size):
+    rows = export_rows()
+    monkeypatch.setattr(clean_data_excel, "iter_excel",
+                        lambda source, chunk_size: clean_data_excel.excel_chunks(rows, chunk_size))
+
+    df = clean_data_excel.clean_data(next(clean_data_excel.excel_chunks(rows, len(rows))))
+    expected = evaluate_rules(df, EXCEL_RULES, patient_key="Patientgegevens")
+
+    df_violating, violations = pipeline.validate_excel_streaming(None, chunk_size)
+    assert violations.equals(expected)
+    assert set(df_violating.index) == set(expected["row"])
+
+
+def test_streaming_matches_read_excel(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+
+    workbook = openpyxl.Workbook()
+    for row in export_rows():
+        workbook.active.append(row)
+    path = tmp_path / "export.xlsx"
+    workbook.save(path)
+
+    _, expected = pipeline.validate_excel(path.read_bytes(), cache_dir=None)
+    _, violations = pipeline.validate_excel_streaming(str(path), chunk_size=7)
+    assert violations.equals(expected)
+
+
+def test_batch_streams_excel_exports(tmp_path, monkeypatch):
+    rows = export_rows()
+    sources = []
+    monkeypatch.setattr(clean_data_excel, "iter_excel",
+                        lambda source, chunk_size: sources.append(source) or clean_data_excel.excel_chunks(rows, 50))
+    monkeypatch.setattr(clean_data_excel, "read_excel",
+                        lambda source: next(clean_data_excel.excel_chunks(rows, len(rows))))
+    path = tmp_path / "export.xlsx"
+    path.write_bytes(b"export")
+    path = str(path)
+
+    streamed = batch.validate_file(path, stream=True)
+    assert sources == [path]
+    pd.testing.assert_frame_equal(streamed, batch.validate_file(path))
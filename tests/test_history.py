@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import pipeline
+from history import HistoryIndex
+from mz301_files import mz301_bytes
+from rules import HISTORY_RULES, evaluate_rules
+
+
+def prestaties(datum, referentie):
+    return pd.DataFrame({
+        "BSN": ["123456782"],
+        "Gebitselementcode": ["16"],
+        "Prestatiecode": ["V35"],
+        "Datum prestatie": pd.to_datetime([datum]),
+        "Referentienummer": [referentie],
+    })
+
+
+@pytest.mark.parametrize("referenties", [("REF1", "REF2"), ("", ""), (None, None)])
+def test_v35_on_the_same_element_in_an_earlier_file(tmp_path, referenties):
+    with HistoryIndex(str(tmp_path / "history.sqlite")) as history:
+        history.add("file-1", prestaties("2024-01-01", referenties[0]))
+
+        df = prestaties("2024-03-01", referenties[1])
+        violations = evaluate_rules(df, HISTORY_RULES, patient_key="BSN", history=history)
+        assert violations["rule_id"].tolist() == ["V35-historie"]
+
+
+def test_reupload_does_not_count_its_own_prestaties(tmp_path):
+    with HistoryIndex(str(tmp_path / "history.sqlite")) as history:
+        df = prestaties("2024-01-01", "REF1")
+        history.add("file-1", df)
+
+        assert evaluate_rules(df, HISTORY_RULES, patient_key="BSN", history=history).empty
+
+
+@pytest.mark.parametrize("referentie", ["", None])
+def test_revalidation_without_referenties_skips_its_own_source(tmp_path, referentie):
+    with HistoryIndex(str(tmp_path / "history.sqlite")) as history:
+        df = pd.concat([prestaties("2024-01-01", referentie), prestaties("2024-01-01", referentie).assign(BSN="2")],
+                       ignore_index=True)
+        history.add("file-1", df)
+
+        assert evaluate_rules(df, HISTORY_RULES, patient_key="BSN", history=history, source="file-1").empty
+        # another file with the same prestaties does count them
+        assert len(evaluate_rules(df, HISTORY_RULES, patient_key="BSN", history=history, source="file-2")) == 2
+
+
+def test_validate_mz301_twice_with_blank_referenties(tmp_path):
+    data = mz301_bytes(referenties=False, seed=3)
+    with HistoryIndex(str(tmp_path / "history.sqlite")) as history:
+        _, first = pipeline.validate_mz301(data, cache_dir=str(tmp_path), history=history)
+        _, second = pipeline.validate_mz301(data, cache_dir=str(tmp_path), history=history)
+
+    assert second.equals(first)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from excel_files import export_frame
+from incremental import IncrementalValidator
+from mz301_files import mz301_bytes
+from rules import EXCEL_RULES, MZ301_RULES, evaluate_rules
+
+
+def corrected(df, seed):
+    """
+    A corrected version of a file: some codes and machtigingen changed, some rows removed,
+    some added again and the order shuffled.
+    """
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    changed = rng.choice(len(df), 20, replace=False)
+    df.loc[df.index[changed[:10]], "Prestatiecode"] = "C002"
+    if "Machtigingsnummer" in df:
+        df.loc[df.index[changed[10:]], "Machtigingsnummer"] = ""
+    else:
+        df.loc[df.index[changed[10:]], "Prestatiecode"] = "P045"
+    df = pd.concat([df.drop(index=df.index[rng.choice(len(df), 5, replace=False)]), df.iloc[100:103]])
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("kind", ["mz301", "excel"])
+def test_incremental_matches_full_evaluation(kind):
+    if kind == "mz301":
+        df = pipeline.cleaned_frame("mz301", mz301_bytes(patients=40, prestaties=30), None)
+        rules, patient_key = MZ301_RULES, "BSN"
+    else:
+        df = export_frame(1500, seed=1, days=4)
+        rules, patient_key = EXCEL_RULES, "Patientgegevens"
+
+    validator = IncrementalValidator(rules, patient_key)
+    for version in [df, df, corrected(df, 1), corrected(df, 2), df.iloc[:0], df]:
+        violations = validator.evaluate(version)
+        expected = evaluate_rules(version, rules, patient_key)
+        assert violations["rule_id"].tolist() == expected["rule_id"].tolist()
+        assert violations["row"].tolist() == expected["row"].tolist()
+
+
+def test_unchanged_file_is_not_evaluated_again():
+    df = pipeline.cleaned_frame("mz301", mz301_bytes(patients=10, prestaties=10), None)
+    validator = IncrementalValidator(MZ301_RULES, "BSN")
+    validator.evaluate(df)
+    validator.evaluate(df.sample(frac=1, random_state=0))
+    assert validator.reevaluated_rows == 0
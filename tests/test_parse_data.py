@@ -0,0 +1,117 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mz301_files import mz301_lines
+from parse_data import (apply_debet_credit, char_matrix, check_parsing, extract_columns, field_digits,
+                        parse_commentaarrecord, parse_mz301, parse_prestatierecord, parse_sluitrecord,
+                        parse_verzekerdenrecord, parse_voorlooprecord, read_mz301)
+from record_layouts import INSURED_INDEX, RECORD_KINDS, RECORD_LENGTH, record_layout
+
+
+def matrix(*fields):
+    return char_matrix([field.ljust(RECORD_LENGTH) for field in fields])
+
+
+def test_leading_spaces_count_as_zeros():
+    values, numeric = field_digits(matrix("0012", "  12", "    "), 0, 4)
+    assert values.tolist() == [12, 12, 0]
+    assert numeric.all()
+
+
+@pytest.mark.parametrize("field", ["1   ", "1 2 ", "12 3", "12a4"])
+def test_other_spaces_are_not_numeric(field):
+    values, numeric = field_digits(matrix(field), 0, 4)
+    assert not numeric.any()
+
+
+def test_extract_columns_rejects_trailing_spaces():
+    with pytest.raises(ValueError, match="Aantal must be numeric."):
+        extract_columns(matrix("1   "), [("Aantal", 0, 4, "int", 0)])
+
+
+MZ301_LINES = [
+    "01   1201                                     12345678          2024010120240131",
+    "02",
+    "03",
+    "03",
+    "07",
+    "99" + "000001" + "000002" + "000000" + "000000" + "0000003" + "00000000000" + "D",
+]
+
+
+def mz301_file(tmp_path):
+    path = tmp_path / "declaratie.txt"
+    path.write_bytes("".join(line.ljust(RECORD_LENGTH) + "\n" for line in MZ301_LINES).encode("ISO-8859-1"))
+    return path
+
+
+@pytest.mark.parametrize("as_path", [True, False])
+def test_read_mz301_returns_unknown_record_counts(tmp_path, as_path):
+    path = mz301_file(tmp_path)
+    source = str(path) if as_path else io.BytesIO(path.read_bytes())
+
+    *frames, unknown = read_mz301(source, chunk_size=1000)
+    assert [len(df) for df in frames] == [1, 1, 0, 0, 1]
+    assert unknown == {"03": 2, "07": 1}
+
+
+def test_check_parsing_reconciles_debiteurrecords(tmp_path):
+    *frames, unknown = read_mz301(str(mz301_file(tmp_path)))
+    assert check_parsing(*frames, unknown) == [
+        "Kenmerk record 07 wordt niet verwerkt (1 regels)",
+        "Totaal aantal detailrecords is 2, zou volgens sluitrecords 3 moeten zijn",
+    ]
+
+    frames[4]["Aantal debiteurrecords"] = 3
+    assert check_parsing(*frames, unknown)[0] == "Aantal debiteurrecords is 2, zou volgens sluitrecords 3 moeten zijn."
+
+
+def test_check_parsing_rejects_other_files():
+    with pytest.raises(ValueError, match="not an MZ301 file"):
+        check_parsing(*read_mz301(io.BytesIO(b"Datum;Prestatiecode\n2024-01-01;V30\n")))
+
+
+def typed_like_columns(records, kind):
+    """
+    Converts the strings of the per-line parse_* functions to the types of the columnar parser.
+    """
+    df = pd.DataFrame(records, columns=[name for name, *_ in record_layout(kind)])
+    for name, start, end, field_kind, scale in record_layout(kind):
+        if field_kind == "int":
+            values = df[name].replace("", "0").astype(np.int64)
+            df[name] = values if scale else values.astype(np.int32)
+        elif field_kind == "date":
+            df[name] = pd.to_datetime(df[name], format="%Y%m%d", errors="coerce")
+        elif field_kind == "code":
+            df[name] = pd.Categorical(df[name])
+    return apply_debet_credit(df, kind)
+
+
+@pytest.mark.parametrize("source", ["lines", "path", "stream"])
+def test_columns_match_the_per_line_parsers(tmp_path, source):
+    lines = mz301_lines(patients=15, prestaties=12, seed=7)
+    data = "".join(line + "\r\n" for line in lines).encode("ISO-8859-1")
+    path = tmp_path / "declaratie.txt"
+    path.write_bytes(data)
+
+    if source == "lines":
+        *frames, unknown = parse_mz301(data.decode("ISO-8859-1"))
+    elif source == "path":
+        *frames, unknown = read_mz301(str(path))
+    else:
+        *frames, unknown = read_mz301(io.BytesIO(data), chunk_size=5000)
+
+    parsers = [parse_voorlooprecord, parse_verzekerdenrecord, parse_prestatierecord, parse_commentaarrecord,
+               parse_sluitrecord]
+    for kind, parse, df in zip(RECORD_KINDS, parsers, frames):
+        expected = typed_like_columns([parse(line) for line in lines if line.startswith(kind)], kind)
+        df = df.drop(columns=[INSURED_INDEX], errors="ignore")
+        for name in expected.columns:
+            if isinstance(expected[name].dtype, pd.CategoricalDtype):
+                assert df[name].astype(str).tolist() == expected[name].astype(str).tolist(), name
+            else:
+                assert df[name].tolist() == expected[name].tolist(), name
+    assert unknown == {}
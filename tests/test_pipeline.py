@@ -0,0 +1,52 @@
+import io
+
+import pandas as pd
+
+import parse_data
+import pipeline
+from mz301_files import mz301_bytes, mz301_lines
+from pipeline import content_hash, content_source
+
+
+def test_upload_hashes_like_its_content():
+    data = b"01   1201\n" * 100
+    upload = io.BytesIO(data)
+    upload.read(5)
+
+    assert content_hash(upload) == content_hash(data)
+    # the upload can still be read after hashing
+    assert content_source(upload).read() == data
+    # and is not left locked by the buffer used for hashing
+    upload.write(b"!")
+
+
+def test_file_on_disk_is_hashed_and_mapped(tmp_path, monkeypatch):
+    data = mz301_bytes(seed=5)
+    path = tmp_path / "declaratie.txt"
+    path.write_bytes(data)
+
+    monkeypatch.setattr(pipeline, "HASH_BLOCK_SIZE", 1000)
+    assert content_hash(str(path)) == content_hash(data)
+
+    mapped = []
+    map_mz301 = parse_data.map_mz301
+    monkeypatch.setattr(parse_data, "map_mz301", lambda *args: mapped.append(args) or map_mz301(*args))
+
+    df, violations = pipeline.validate_mz301(str(path), cache_dir=str(tmp_path / "cache"))
+    expected_df, expected_violations = pipeline.validate_mz301(data, cache_dir=str(tmp_path / "cache2"))
+    assert len(mapped) == 1
+    pd.testing.assert_frame_equal(df, expected_df)
+    pd.testing.assert_frame_equal(violations, expected_violations)
+
+
+def test_report_starts_with_the_sluitrecord_mismatches(tmp_path):
+    lines = mz301_lines(seed=5)
+    # drop one prestatierecord, the sluitrecord still counts it
+    del lines[2]
+    data = "".join(line + "\n" for line in lines).encode("ISO-8859-1")
+
+    report = pipeline.validate_report("mz301", data, cache_dir=None)
+    checks = report[report["Sectie"] == pipeline.FILE_CHECKS]
+    assert checks.index.tolist() == [0, 1, 2]
+    assert checks["Controle"].str.contains("Aantal prestatierecords is 159").any()
+    assert report["Regel"].iloc[3:].map(type).eq(int).all()
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from clean_data import kaak
+from excel_files import export_frame
+from mz301_files import mz301_bytes
+from rules import (EXCEL_RULES, MAXIMALE_TECHNIEK, MINIMALE_TECHNIEK, MZ301_RULES, P045_KAAK, PATIENT_DAY_KAAK,
+                   Groups, evaluate_rules)
+
+
+def test_groups_without_any_group():
+    df = pd.DataFrame({"BSN": ["1", "2"], "Datum prestatie": pd.to_datetime(["2024-01-01"] * 2),
+                       "Kaak": pd.Series([None, None], dtype=object)})
+    groups = Groups(df, "BSN")
+
+    assert groups.count(PATIENT_DAY_KAAK, np.ones(2, dtype=bool)).tolist() == [0, 0]
+    assert groups.sizes(PATIENT_DAY_KAAK).tolist() == [0, 0]
+
+
+def test_mz301_without_elements(tmp_path):
+    df, violations = pipeline.validate_mz301(mz301_bytes(elements=[""]), cache_dir=str(tmp_path))
+    assert df["Kaak"].isna().all()
+    assert set(violations["rule_id"]) <= {rule.rule_id for rule in MZ301_RULES}
+    assert "P045-kaak" not in set(violations["rule_id"])
+
+
+def test_p045_kaak_counts_jaw_labels_apart_from_teeth():
+    # P1: 5x P045 on "Bovenkaak" and 5x on upper teeth, under the limit of 8 each
+    # P2: 9x on "Bovenkaak" and 5x on upper teeth, only the jaw label rows exceed it
+    teeth = ["11", "12", "21", "22", "23"]
+    df = pd.DataFrame({
+        "Patientgegevens": ["P1"] * 10 + ["P2"] * 14,
+        "Datum prestatie": pd.to_datetime(["2024-01-01"] * 24),
+        "Prestatiecode": ["P045"] * 24,
+        "Gebitselementcode": ["Bovenkaak"] * 5 + teeth + ["Bovenkaak"] * 9 + teeth,
+    })
+    df["Kaak"] = kaak(df["Gebitselementcode"])
+
+    violations = evaluate_rules(df, [P045_KAAK], patient_key="Patientgegevens")
+    assert violations["row"].tolist() == list(range(10, 19))
+
+
+### the checks as the apps did them before the rule engine ######################
+
+def old_co_occurrence(df, keys, first, second, flagged):
+    # first and second test the Prestatiecodes of a group, flagged the rows that are shown
+    rows = df.groupby(keys).filter(lambda group: first(group["Prestatiecode"]).any()
+                                   and second(group["Prestatiecode"]).any())
+    return rows[rows["Prestatiecode"].str.contains(flagged, na=False)].index
+
+
+def old_frequency(df, keys, code, maximum):
+    counts = df.groupby(keys)["Prestatiecode"].transform(lambda s: (s == code).sum())
+    return df[(df["Prestatiecode"] == code) & (counts > maximum)].index
+
+
+def old_missing_machtiging(df):
+    return (df["Machtigingsnummer"].isna() | (df["Machtigingsnummer"] == "")
+            | (df["Machtigingsnummer"].str.len() < 5))
+
+
+def old_p045_per_kaak(df, patient):
+    # as fixed in user-008/011: only P045s count, and only those on the jaw over the limit are shown;
+    # jaw labels ("Bovenkaak", "Onderkaak") and teeth (first FDI digit) are counted apart
+    element = df["Gebitselementcode"].astype(str)
+    buckets = [element == "Bovenkaak", element == "Onderkaak",
+               ~element.isin(["Bovenkaak", "Onderkaak"]) & element.str[0].isin(["1", "2"]),
+               ~element.isin(["Bovenkaak", "Onderkaak"]) & element.str[0].isin(["3", "4"])]
+    p045 = df["Prestatiecode"] == "P045"
+    flagged = pd.Series(False, index=df.index)
+    for bucket in buckets:
+        counts = (p045 & bucket).groupby([df[patient], df["Datum prestatie"]]).transform("sum")
+        flagged |= p045 & bucket & (counts > 8)
+    return df[flagged].index
+
+
+def old_common_checks(df, patient):
+    day, element = [patient, "Datum prestatie"], [patient, "Datum prestatie", "Gebitselementcode"]
+    code = df["Prestatiecode"]
+    return {
+        "C-T": old_co_occurrence(df, day, lambda s: s.str.contains("C"), lambda s: s.str.contains("T"), "C|T"),
+        "A10-H": old_co_occurrence(df, element, lambda s: s.str.contains("A10"), lambda s: s.str.contains("H"), "A10|H"),
+        "E02-C": old_co_occurrence(df, day, lambda s: s.eq("E02"), lambda s: s.isin(["C001", "C002", "C003"]),
+                                   "E02|C001|C002|C003"),
+        "G72": df[code == "G72"].index,
+        "V30": old_frequency(df, day, "V30", 1),
+        "V35": old_frequency(df, element, "V35", 1),
+        "P045": old_frequency(df, element, "P045", 1),
+        "P045-kaak": old_p045_per_kaak(df, patient),
+    }
+
+
+def old_mz301_checks(df):
+    code = df["Prestatiecode"]
+    vgz_minor = (df["Leeftijd"] < 18) & df["Verzekering"].str.contains("VGZ", na=False) & old_missing_machtiging(df)
+    techniek = df["Indicatie soort prestatierecord"] == "02"
+    checks = old_common_checks(df, "BSN")
+    checks.update({
+        "J049": df[(code == "J049") & (df["Geboortedatum"].isna() | old_missing_machtiging(df))].index,
+        "P045-element": df[(code == "P045") & (df["Gebitselementcode"].isna() | (df["Gebitselementcode"] == "")
+                                               | (df["Gebitselementcode"].str.len() != 2))].index,
+        "X21": df[(df["Leeftijd"] < 18) & (code == "X21") & old_missing_machtiging(df)].index,
+        "G-VGZ": df[(code == "G") & vgz_minor].index,
+        "T-VGZ": df[(code == "T") & vgz_minor].index,
+    })
+    # bedragen are in cents now
+    for rule in MINIMALE_TECHNIEK + MAXIMALE_TECHNIEK:
+        euros = int(rule.title.split(" van ")[1].split()[0])
+        tarief = df["Tarief prestatie"] < euros * 100 if "minimale" in rule.title else df["Tarief prestatie"] > euros * 100
+        checks[rule.rule_id] = df[(code == rule.rule_id) & techniek & tarief].index
+    return checks
+
+
+def old_excel_checks(df):
+    code = df["Prestatiecode"]
+    day = ["Patientgegevens", "Datum prestatie"]
+    checks = old_common_checks(df, "Patientgegevens")
+    checks.update({
+        "P045-element": df[(code == "P045") & (df["Gebitselementcode"].isna() | (df["Gebitselementcode"] == ""))].index,
+        "C022": old_frequency(df, day, "C022", 4),
+        "J042-R": old_co_occurrence(df, day, lambda s: s.isin(["J042", "J043"]), lambda s: s.str.contains("R", na=False),
+                                    "J042|J043|R"),
+        "J042-J040": old_co_occurrence(df, day, lambda s: s.isin(["J042", "J043"]), lambda s: s.isin(["J040", "J041"]),
+                                       "J042|J043|J040|J041"),
+        "T102": old_frequency(df, day, "T102", 1),
+        "negatief": df[(df["Totaal Bedrag"] < 0) | (df["Techniek"] < 0) | (df["Honorarium"] < 0)].index,
+    })
+    return checks
+
+
+def assert_same_rows(df, rules, patient_key, expected):
+    violations = evaluate_rules(df, rules, patient_key=patient_key)
+    assert sorted(rule.rule_id for rule in rules) == sorted(expected)
+    for rule in rules:
+        rows = violations.loc[violations["rule_id"] == rule.rule_id, "row"].tolist()
+        assert rows == sorted(expected[rule.rule_id]), rule.rule_id
+
+
+# many patients for the age and insurer checks, many prestaties per patient for P045-kaak
+@pytest.mark.parametrize("patients, prestaties, seed", [(40, 45, 0), (40, 45, 1), (12, 150, 1)])
+def test_mz301_rules_flag_the_rows_of_the_old_checks(patients, prestaties, seed):
+    df = pipeline.cleaned_frame("mz301", mz301_bytes(patients=patients, prestaties=prestaties, seed=seed), None)
+    assert_same_rows(df, MZ301_RULES, "BSN", old_mz301_checks(df))
+
+
+@pytest.mark.parametrize("n, seed, days", [(600, 1, 20), (1500, 1, 2), (1500, 2, 2)])
+def test_excel_rules_flag_the_rows_of_the_old_checks(n, seed, days):
+    df = export_frame(n, seed, days)
+    assert_same_rows(df, EXCEL_RULES, "Patientgegevens", old_excel_checks(df))
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import service
+
+
+@pytest.fixture
+def validate(monkeypatch):
+    """Replaces the pipeline by one that waits for `release` before reporting the length of the upload."""
+    release = threading.Event()
+
+    def validate_report(kind, data):
+        release.wait(5)
+        return pd.DataFrame({"lengte": [len(data)]})
+
+    monkeypatch.setattr(service, "validate_report", validate_report)
+    yield release
+    release.set()
+
+
+def test_stop_fails_unfinished_jobs(validate):
+    async def main():
+        validation = service.ValidationService(workers=1, executor=ThreadPoolExecutor(1))
+        await validation.start()
+        running = await validation.submit("mz301", b"a")
+        queued = await validation.submit("mz301", b"b")
+        await asyncio.sleep(0.05)
+        await validation.stop()
+
+        for job_id in (running, queued):
+            assert validation.status(job_id) == "failed"
+            with pytest.raises(RuntimeError, match="stopped"):
+                await asyncio.wait_for(validation.result(job_id), 1)
+
+    asyncio.run(main())
+
+
+def test_finished_jobs_expire(validate):
+    validate.set()
+
+    async def main():
+        async with service.ValidationService(workers=1, executor=ThreadPoolExecutor(1), max_finished=2) as validation:
+            job_ids = [await validation.submit("mz301", b"x" * n) for n in range(4)]
+            assert len(await validation.result(job_ids[-1])) == 1
+            assert list(validation.jobs) == job_ids[2:]
+
+            validation.keep_seconds = 0
+            await validation.submit("mz301", b"y")
+            assert set(validation.jobs).isdisjoint(job_ids)
+
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+import pandas as pd
+
+import validate
+from mz301_files import mz301_lines
+
+
+def test_cli_reports_sluitrecord_mismatches_and_failed_files(tmp_path, capsys):
+    lines = mz301_lines()
+    del lines[2]
+    mz301 = tmp_path / "declaratie.txt"
+    mz301.write_bytes("".join(line + "\n" for line in lines).encode("ISO-8859-1"))
+    other = tmp_path / "notities.txt"
+    other.write_text("geen mz301\n")
+    output = tmp_path / "violations.csv"
+
+    assert validate.main([str(mz301), str(other), "-o", str(output), "-j", "1"]) == 1
+    report = pd.read_csv(output)
+    checks = report[report["Sectie"] == "Bestandscontroles"]
+    assert (checks["Bestand"] == str(mz301)).all()
+    assert checks["Controle"].str.startswith("Aantal prestatierecords is").any()
+
+    errors = capsys.readouterr().err
+    assert f"{other}: ValueError: File has no voorlooprecord" in errors
+    assert "1 bestanden gecontroleerd, 1 mislukt" in errors
+
+
+def test_cli_writes_no_report_when_every_file_fails(tmp_path, capsys):
+    other = tmp_path / "notities.txt"
+    other.write_text("geen mz301\n")
+    output = tmp_path / "violations.csv"
+
+    assert validate.main([str(other), "-o", str(output), "-j", "1"]) == 1
+    assert not output.exists()
+    assert "geen rapport geschreven" in capsys.readouterr().err
@@ -0,0 +1,74 @@
+"""
+Checks mz301 files and excel exports without streamlit and writes one violations report.
+
+    python validate.py declaraties/ extra.txt -o violations.csv --workers 8 --timeout 600
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from batch import validate_files
+from pipeline import FILE_CHECKS, PIPELINES
+
+
+def find_files(paths):
+    """
+    Expands directories into the files they contain (recursively, hidden files skipped).
+    Returns the file paths in a fixed order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                files.extend(os.path.join(root, name) for name in sorted(names) if not name.startswith("."))
+        else:
+            files.append(path)
+    return files
+
+
+def parse_args(argv=None):
+    """
+    Returns the parsed command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Controleer mz301 bestanden en excel exports op ongeldige declaraties.")
+    parser.add_argument("paths", nargs="+", help="bestanden of mappen met bestanden")
+    parser.add_argument("-o", "--output", default="violations.csv", help="csv bestand voor het rapport (standaard: %(default)s)")
+    parser.add_argument("--kind", choices=sorted(PIPELINES), help="soort bestand, standaard bepaald op extensie")
+    parser.add_argument("-j", "--workers", type=int, help="aantal processen (standaard: aantal cores)")
+    parser.add_argument("--timeout", type=float, help="maximaal aantal seconden per bestand")
+    parser.add_argument("--history", help="sqlite bestand met eerdere prestaties, voor controles over meerdere bestanden "
+                        "(bestanden worden dan een voor een op volgorde gecontroleerd)")
+    parser.add_argument("--stream", action="store_true",
+                        help="lees excel exports in delen, voor grote exports (moeten op datum gesorteerd zijn)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    reports, failed = [], 0
+    files = find_files(args.paths)
+    for path, report, error in validate_files(files, args.kind, workers=args.workers, timeout=args.timeout,
+                                                  history_path=args.history, stream=args.stream):
+        if error is not None:
+            # a broken file does not stop the other files from being checked
+            print(f"{path}: {error}", file=sys.stderr)
+            failed += 1
+            continue
+        meldingen = (report["Sectie"] == FILE_CHECKS).sum()
+        print(f"{path}: {len(report) - meldingen} overtredingen, {meldingen} meldingen over het bestand", file=sys.stderr)
+        reports.append(report)
+
+    if reports:
+        pd.concat(reports, ignore_index=True).to_csv(args.output, index=False)
+        print(f"{len(reports)} bestanden gecontroleerd, {failed} mislukt, rapport in {args.output}", file=sys.stderr)
+    else:
+        print(f"geen bestanden gecontroleerd, {failed} mislukt, geen rapport geschreven", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())